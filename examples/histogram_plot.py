@@ -0,0 +1,31 @@
+import bpy
+import sys
+import math
+import os
+
+
+working_dir_path = os.path.abspath("/genpyblender/")
+sys.path.append(working_dir_path)
+
+import numpy as np
+from mathutils import Vector
+from genpyblender import make_image, utils, camera, lighting, colormap, plots
+
+
+def draw(pixel_width, pixel_height, frame_no, frame_count):
+
+    camera_object = camera.create_plot_camera()
+    lighting.create_sun_light()
+
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=1000000)
+    y = rng.normal(size=1000000) * 0.5 + x * 0.5
+
+    axes = plots.Axes().of_start((-3, -3, 0)).of_extent((6, 6, 2000)).with_divisions((1, 1, 500))
+    axes.draw()
+    plot = plots.Plot3dBars(axes).of_samples(x, y, bins=60).fill(colormap.ViridianMap(0, 1))
+    plot.plot()
+
+    return camera_object
+
+make_image.make_blender_image("histogram_plot", draw, 500, 500)
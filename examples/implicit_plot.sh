@@ -0,0 +1 @@
+blender --background -noaudio --python implicit_plot.py --render-frame 1
\ No newline at end of file
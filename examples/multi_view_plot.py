@@ -0,0 +1,29 @@
+import bpy
+import sys
+import math
+import os
+
+
+working_dir_path = os.path.abspath("/genpyblender/")
+sys.path.append(working_dir_path)
+
+import numpy as np
+from mathutils import Vector
+from genpyblender import make_image, utils, camera, lighting, colormap, plots
+
+
+def draw(pixel_width, pixel_height, frame_no, frame_count):
+
+    camera_object = camera.create_plot_camera()
+    lighting.create_sun_light()
+
+    axes = plots.Axes().of_start((-2, -2, -1)).of_extent((4, 4, 2)).with_divisions((1, 1, .5))
+    axes.draw()
+    plot = plots.Plot3dZofXY(axes).of_function(lambda x, y: np.sin(x)*np.cos(y), precision=100).fill(colormap.ViridianMap(0, 1))
+    plot.plot()
+
+    return camera_object
+
+# Eight views around the plot, written as multi_view_plot0001.png to multi_view_plot0008.png
+views = [dict(xy_rot=-math.pi/4 + i*math.pi/4) for i in range(8)]
+make_image.make_blender_image("multi_view_plot", draw, 500, 500, views=views)
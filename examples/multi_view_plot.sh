@@ -0,0 +1 @@
+blender --background -noaudio --python multi_view_plot.py
@@ -0,0 +1 @@
+blender --background -noaudio --python ../genpyblender/worker.py -- --socket /tmp/genpyblender.sock
\ No newline at end of file
@@ -0,0 +1,35 @@
+import bpy
+import sys
+import math
+import os
+
+
+working_dir_path = os.path.abspath("/genpyblender/")
+sys.path.append(working_dir_path)
+
+from mathutils import Vector
+from genpyblender import make_image, utils, camera, lighting, colormap, plots, layout
+
+
+def draw(pixel_width, pixel_height, frame_no, frame_count):
+
+    grid = layout.SubplotLayout(3, 3)
+    camera_object = grid.create_camera()
+    lighting.create_sun_light()
+
+    for row in range(3):
+        for col in range(3):
+            a = row + 1
+            b = col + 1
+
+            def draw_panel(axes):
+                axes.of_start((-1, -1, -1)).of_extent((2, 2, 2)).with_divisions((.5, .5, .5))
+                axes.draw()
+                plot = plots.Plot3dZofXY(axes).of_function(lambda x, y: math.cos(a*x)*math.sin(b*y), precision=40).fill(colormap.ViridianMap(0, 1))
+                plot.plot()
+
+            grid.draw_panel(row, col, draw_panel)
+
+    return camera_object
+
+make_image.make_blender_image("small_multiples_plot", draw, 1200, 1200)
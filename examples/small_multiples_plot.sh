@@ -0,0 +1 @@
+blender --background -noaudio --python small_multiples_plot.py --render-frame 1
\ No newline at end of file
@@ -0,0 +1,27 @@
+import bpy
+import sys
+import math
+import os
+
+
+working_dir_path = os.path.abspath("/genpyblender/")
+sys.path.append(working_dir_path)
+
+import numpy as np
+from mathutils import Vector
+from genpyblender import make_image, utils, camera, lighting, colormap, plots
+
+
+def draw(pixel_width, pixel_height, frame_no, frame_count):
+
+    camera_object = camera.create_plot_camera()
+    lighting.create_sun_light()
+
+    axes = plots.Axes().of_start((-1.5, -1.5, -1.5)).of_extent((3, 3, 3)).with_divisions((.5, .5, .5))
+    axes.draw()
+    plot = plots.Plot3dVolume(axes).of_function(lambda x, y, z: np.exp(-2*(x**2 + y**2 + z**2)) * np.cos(3*x)**2, precision=64).fill(colormap.ViridianMap(0, 1))
+    plot.plot()
+
+    return camera_object
+
+make_image.make_blender_image("volume_plot", draw, 500, 500)
@@ -8,6 +8,7 @@ import math
 from typing import Tuple
 
 import bpy
+import numpy as np
 from mathutils import Vector
 
 
@@ -50,3 +51,47 @@ def create_plot_camera(distance=4, xy_rot=-math.pi/4, z_rot=math.pi/6, scale=4):
     camera_object.data.ortho_scale = scale
     return camera_object
 
+def aim_plot_camera(camera_object, distance=4, xy_rot=-math.pi/4, z_rot=math.pi/6, scale=4):
+    '''
+    Move an existing plot camera to a new viewpoint. The arguments are the same as create_plot_camera.
+    '''
+    camera_object.location = (distance*math.cos(xy_rot), distance*math.sin(xy_rot), distance*math.cos(z_rot))
+    bpy.context.view_layer.update()
+    look_at(camera_object, Vector((0, 0, 0)))
+    camera_object.data.ortho_scale = scale
+    bpy.context.view_layer.update()
+
+def align_perpendicular_to_camera(object, camera):
+    view_vector = camera.matrix_world.to_quaternion() @ Vector((0, 0, 1))
+    object.rotation_euler = view_vector.to_track_quat('Z', 'Y').to_euler()
+    bpy.context.view_layer.update()
+
+def project_to_pixels(camera_object, points, scene=None):
+    '''
+    Project points onto the rendered image of an orthographic camera.
+
+    Args:
+        camera_object: the camera object.
+        points: (..., 3) array of points in blender coordinates.
+        scene: the scene that supplies the output resolution. Defaults to the current scene.
+
+    Returns:
+        (..., 2) array of pixel coordinates, measured from the bottom left corner of the image
+    '''
+    if scene is None:
+        scene = bpy.context.scene
+    bpy.context.view_layer.update()
+
+    render = scene.render
+    res_x = render.resolution_x * render.resolution_percentage / 100
+    res_y = render.resolution_y * render.resolution_percentage / 100
+    fit = camera_object.data.sensor_fit
+    if fit == 'AUTO':
+        fit = 'HORIZONTAL' if res_x >= res_y else 'VERTICAL'
+    pixel_size = camera_object.data.ortho_scale / (res_x if fit == 'HORIZONTAL' else res_y)
+
+    matrix = np.array(camera_object.matrix_world.inverted())
+    points = np.asarray(points, dtype=np.float64)
+    local = points @ matrix[:3, :3].T + matrix[:3, 3]
+    return np.stack((local[..., 0] / pixel_size + res_x / 2, local[..., 1] / pixel_size + res_y / 2), axis=-1)
+
@@ -3,6 +3,9 @@
 # Copyright (c) 2025, Martin McBride
 # License: GNU GPL V 3
 
+import numpy as np
+
+
 def ViridianMap(minval, maxval, steps=1000):
 
     colors = [None]*steps
@@ -24,4 +27,50 @@ def ViridianMap(minval, maxval, steps=1000):
         idx = min(steps-1, max(0, int(v*steps)))
         return colors[idx]
 
+    # Describe the map so it can also be built as a shader colour ramp
+    colormap.minval = minval
+    colormap.maxval = maxval
+    colormap.stops = ((0, c1), (0.5, c2), (1, c3))
+
     return colormap
+
+def color_stops(colormap, count=32):
+    '''
+    Get the colour stops of a colormap, as used by a shader colour ramp.
+
+    Args:
+        colormap: a colormap function. If it has a stops attribute (like ViridianMap) that is used, otherwise the
+            colormap is sampled at count points between its minval and maxval attributes (or between 0 and 1).
+        count: number of samples to use. Blender colour ramps have at most 32 stops.
+
+    Returns:
+        list of (position, color) tuples with positions from 0 to 1
+    '''
+    stops = getattr(colormap, "stops", None)
+    if stops is not None:
+        return [(position, tuple(color)) for position, color in stops]
+    minval = getattr(colormap, "minval", 0)
+    maxval = getattr(colormap, "maxval", 1)
+    return [(i / (count - 1), tuple(colormap(minval + (maxval - minval) * i / (count - 1)))) for i in range(count)]
+
+def map_values(colormap, values):
+    '''
+    Get the colours of an array of values in one call.
+
+    Args:
+        colormap: a colormap function. If it has stops, minval and maxval attributes (like ViridianMap) the colours are
+            interpolated between the stops with numpy, otherwise the colormap is called once per value, which is slow
+            for large arrays.
+        values: array of values.
+
+    Returns:
+        (n, 4) float32 array of colours
+    '''
+    values = np.asarray(values, dtype=np.float64).ravel()
+    stops = getattr(colormap, "stops", None)
+    if stops is None or not hasattr(colormap, "minval") or not hasattr(colormap, "maxval"):
+        return np.array([colormap(v) for v in values], dtype=np.float32).reshape(-1, 4)
+    positions = np.array([position for position, _ in stops], dtype=np.float64)
+    colors = np.array([color for _, color in stops], dtype=np.float64)
+    t = np.clip((values - colormap.minval) / (colormap.maxval - colormap.minval), 0, 1)
+    return np.stack([np.interp(t, positions, colors[:, channel]) for channel in range(4)], axis=-1).astype(np.float32)
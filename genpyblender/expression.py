@@ -0,0 +1,134 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Plot functions written as expression strings, such as "exp(y)*cos(x)". An expression is parsed once, checked against a
+whitelist of syntax and function names, and compiled to numpy code, so it is evaluated over a whole grid in one call.
+Each expression has a stable hash of its parsed form, which can be used as a cache key.
+'''
+
+import ast
+import hashlib
+
+import numpy as np
+
+# Names that can be used in expressions, mapped to the numpy functions and constants they stand for
+FUNCTIONS = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan, "atan2": np.arctan2,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "exp": np.exp, "log": np.log, "log10": np.log10, "log2": np.log2, "sqrt": np.sqrt,
+    "abs": np.abs, "floor": np.floor, "ceil": np.ceil, "hypot": np.hypot,
+    "min": np.minimum, "max": np.maximum,
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+# Number of arguments each function takes
+ARITY = dict.fromkeys(FUNCTIONS, 1)
+ARITY.update(atan2=2, hypot=2, min=2, max=2)
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant, ast.Load,
+                  ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv, ast.USub, ast.UAdd)
+
+
+class _FloatConstants(ast.NodeTransformer):
+    '''
+    Make every number in the expression a numpy float64, so that powers of large integers such as 9**9**9 overflow to
+    inf rather than being calculated exactly as Python integers (or raising OverflowError as Python floats). Integer
+    literals too large for a float become inf.
+    '''
+
+    def visit_Constant(self, node):
+        try:
+            value = float(node.value)
+        except OverflowError:
+            value = np.inf
+        call = ast.Call(func=ast.Name(id="_float64", ctx=ast.Load()), args=[ast.Constant(value=value)], keywords=[])
+        return ast.copy_location(call, node)
+
+
+class Expression:
+    '''
+    A compiled expression string. Expressions are callable, with one argument per variable, and can be passed anywhere a
+    plot function is expected.
+    '''
+
+    def __init__(self, source, variables):
+        '''
+        Args:
+            source: the expression, using the variables, numbers, the operators + - * / // % ** and the names in
+                FUNCTIONS and CONSTANTS.
+            variables: sequence of variable names, in the order the arguments are passed, eg ("x", "y").
+
+        Raises:
+            ValueError: if the expression can't be parsed or uses anything outside the whitelist.
+        '''
+        self.source = source
+        self.variables = tuple(variables)
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression {source!r}: {e.msg}") from None
+        self._check(tree)
+        tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+        self.hash = hashlib.sha256(repr((self.variables, ast.dump(tree))).encode()).hexdigest()
+        self._code = compile(tree, f"<expression {source!r}>", "eval")
+
+    def _check(self, tree):
+        # ast.walk visits each call before its func, so the function names are known by the time they are reached
+        function_names = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"{type(node).__name__} is not allowed in expression {self.source!r}")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError(f"Only numbers are allowed as constants in expression {self.source!r}")
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                    raise ValueError(f"Unknown function in expression {self.source!r}")
+                if node.keywords:
+                    raise ValueError(f"Keyword arguments are not allowed in expression {self.source!r}")
+                if len(node.args) != ARITY[node.func.id]:
+                    raise ValueError(f"{node.func.id} takes {ARITY[node.func.id]} arguments, got {len(node.args)} in "
+                                     f"expression {self.source!r}")
+                function_names.add(node.func)
+            elif isinstance(node, ast.Name) and node not in function_names:
+                if node.id in FUNCTIONS:
+                    raise ValueError(f"Function {node.id!r} must be called in expression {self.source!r}")
+                if node.id not in CONSTANTS and node.id not in self.variables:
+                    raise ValueError(f"Unknown name {node.id!r} in expression {self.source!r}, "
+                                     f"expected one of {self.variables}")
+
+    def __call__(self, *args):
+        if len(args) != len(self.variables):
+            raise TypeError(f"Expression {self.source!r} takes {len(self.variables)} arguments, got {len(args)}")
+        namespace = dict(FUNCTIONS)
+        namespace.update(CONSTANTS)
+        namespace["_float64"] = np.float64
+        namespace.update(zip(self.variables, args))
+        return eval(self._code, {"__builtins__": {}}, namespace)
+
+    def __eq__(self, other):
+        return isinstance(other, Expression) and self.hash == other.hash
+
+    def __hash__(self):
+        return hash(self.hash)
+
+    def __repr__(self):
+        return f"Expression({self.source!r}, {self.variables})"
+
+
+def as_function(function, variables):
+    '''
+    Compile function if it is an expression string, otherwise return it unchanged.
+
+    Args:
+        function: a callable or an expression string.
+        variables: variable names of the expression, see Expression.
+
+    Returns:
+        A callable
+    '''
+    if isinstance(function, str):
+        return Expression(function, variables)
+    return function
@@ -0,0 +1,105 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Small multiples: a grid of axes in a single scene, framed by one camera and rendered in one pass.
+'''
+
+import math
+
+import bpy
+import numpy as np
+from genpyblender import camera, plots
+
+
+class SubplotLayout:
+
+    def __init__(self, rows, cols, spacing=4, scale=1):
+        '''
+        A rows x cols grid of panels. Panels are laid out in the image plane of the camera, so they appear as a regular
+        grid in the rendered image.
+
+        Args:
+            rows: number of rows.
+            cols: number of columns.
+            spacing: distance between panel centres, in blender units. The default suits axes of the default size
+                with labels.
+            scale: size of each axes relative to the default size.
+        '''
+        self.rows = rows
+        self.cols = cols
+        self.spacing = spacing
+        self.scale = scale
+        self.distance = 4
+        self.xy_rot = -math.pi/4
+        self.z_rot = math.pi/6
+
+    def _camera_basis(self):
+        '''
+        Right and up unit vectors of the image plane of the camera.
+        '''
+        location = np.array((math.cos(self.xy_rot), math.sin(self.xy_rot), math.cos(self.z_rot)))
+        forward = -location / np.linalg.norm(location)
+        right = np.cross(forward, (0, 0, 1))
+        right /= np.linalg.norm(right)
+        up = np.cross(right, forward)
+        return right, up
+
+    def panel_offset(self, row, col):
+        '''
+        Scene position of the centre of a panel. Row 0 is at the top of the image, column 0 on the left.
+        '''
+        right, up = self._camera_basis()
+        x = (col - (self.cols - 1) / 2) * self.spacing
+        y = ((self.rows - 1) / 2 - row) * self.spacing
+        return tuple(x * right + y * up)
+
+    def create_camera(self, distance=4, xy_rot=-math.pi/4, z_rot=math.pi/6):
+        '''
+        Create a single orthographic camera that frames every panel. This must be called before any panels are drawn,
+        because axis labels are aligned to the camera when they are created.
+
+        Args:
+            distance, xy_rot, z_rot: camera position, as for camera.create_plot_camera.
+
+        Returns:
+            The camera object
+        '''
+        self.distance = distance
+        self.xy_rot = xy_rot
+        self.z_rot = z_rot
+        render = bpy.context.scene.render
+        aspect = render.resolution_x / render.resolution_y
+        ortho_scale = max(self.cols * self.spacing, self.rows * self.spacing * aspect)
+        return camera.create_plot_camera(distance, xy_rot, z_rot, ortho_scale)
+
+    def draw_panel(self, row, col, draw):
+        '''
+        Draw one panel.
+
+        Args:
+            row: panel row.
+            col: panel column.
+            draw: function draw(axes) that configures and draws the axes and creates the plots, exactly as for a single
+                plot. Everything it creates is then moved into place.
+
+        Returns:
+            The axes of the panel
+        '''
+        offset = self.panel_offset(row, col)
+        axes = plots.Axes().with_placement(offset, self.scale)
+
+        before = set(obj.name for obj in bpy.data.objects)
+        draw(axes)
+        created = [obj for obj in bpy.data.objects if obj.name not in before and obj.parent is None]
+
+        panel = bpy.data.objects.new(f"panel_{row}_{col}", None)
+        bpy.context.collection.objects.link(panel)
+        panel.location = offset
+        panel.scale = (self.scale, self.scale, self.scale)
+        for obj in created:
+            obj.parent = panel
+        bpy.context.view_layer.update()
+        return axes
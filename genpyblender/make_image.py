@@ -4,9 +4,35 @@
 # License: GNU GPL V 3
 
 import bpy
-from genpyblender import utils
+from genpyblender import utils, camera, render_cache
 
-def make_blender_image(outfile, draw, width, height):
+def make_blender_image(outfile, draw, width, height, crop_to_plot=False, crop_margin=0.02, render=False,
+                       cache_dir=None, views=None):
+    '''
+    Set up a scene and render settings for an image, and optionally render it.
+
+    Args:
+        outfile: output file path, without the frame number and extension.
+        draw: function draw(pixel_width, pixel_height, frame_no, frame_count) that creates the scene content and
+            returns the camera object.
+        width: image width in pixels.
+        height: image height in pixels.
+        crop_to_plot: if True, only the region of the image covered by the axes, labels and plots (plus crop_margin) is
+            rendered, and the output image is cropped to that region.
+        crop_margin: margin around the plot as a fraction of the image size, used with crop_to_plot.
+        render: if True, render and save the image. Otherwise the image is rendered by Blender's --render-frame
+            option.
+        cache_dir: if set, the image is rendered (as for render=True) through a cache in this directory. If the scene
+            is identical to one rendered before, the cached image is copied instead of rendering.
+        views: optional list of camera views, each a dictionary of create_plot_camera arguments (distance, xy_rot,
+            z_rot, scale) or a tuple of them in that order. The scene is built once, then for each view the camera
+            returned by draw is moved, the text labels are turned to face it, and the image is rendered as frame 1, 2,
+            3... of outfile. Plots with "auto" precision use the camera as it was when draw ran.
+
+    Returns:
+        Path of the saved image if the image was rendered, otherwise None. If views is set, a list of the saved images
+        in view order.
+    '''
     output_file_path = bpy.path.relpath(outfile)
     resolution_percentage = 100
     num_samples = 128
@@ -19,11 +45,62 @@ def make_blender_image(outfile, draw, width, height):
     bpy.data.worlds["World"].node_tree.nodes["Background"].inputs[0].default_value = [1, 1, 1, 1]
     bpy.data.worlds["World"].node_tree.nodes["Background"].inputs[1].default_value = 1
 
-    camera_object = draw(width, height, 0, 1)
-
+    # Output size is set before drawing so that plots with automatic precision can use it
     scene = bpy.data.scenes["Scene"]
     utils.set_output_properties(scene, resolution_percentage, output_file_path, res_x=width, res_y=height)
+
+    camera_object = draw(width, height, 0, 1)
+
     utils.set_cycles_renderer(scene, camera_object, num_samples)
 
+    if views is not None:
+        return render_views(scene, camera_object, views, crop_to_plot, crop_margin, cache_dir)
+
+    if crop_to_plot:
+        utils.set_border_to_objects(scene, camera_object, crop_margin)
+
+    if render or cache_dir:
+        return render_still(cache_dir)
+    return None
+
+def render_still(cache_dir=None):
+    '''
+    Render the current frame of the scene set up by make_blender_image, and save it.
+
+    Args:
+        cache_dir: if set, use the render cache in this directory, see render_cache.py.
+
+    Returns:
+        Path of the saved image
+    '''
+    scene = bpy.data.scenes["Scene"]
+    path = bpy.path.abspath(scene.render.frame_path(frame=scene.frame_current))
+    if cache_dir:
+        return render_cache.render_cached(scene, path, cache_dir, lambda: bpy.ops.render.render(write_still=True))
+    bpy.ops.render.render(write_still=True)
+    return path
+
+def render_views(scene, camera_object, views, crop_to_plot=False, crop_margin=0.02, cache_dir=None):
+    '''
+    Render the scene from several camera views, see make_blender_image.
+
+    Returns:
+        List of the saved image paths
+    '''
+    labels = [obj for obj in scene.objects if obj.type == 'FONT']
+    paths = []
+    for frame, view in enumerate(views, 1):
+        if isinstance(view, dict):
+            camera.aim_plot_camera(camera_object, **view)
+        else:
+            camera.aim_plot_camera(camera_object, *view)
+        for label in labels:
+            camera.align_perpendicular_to_camera(label, camera_object)
+        if crop_to_plot:
+            utils.set_border_to_objects(scene, camera_object, crop_margin)
+        scene.frame_current = frame
+        paths.append(render_still(cache_dir))
+    return paths
+
 def example_blender_draw_function(pixel_width, pixel_height, frame_no, frame_count):
     pass
\ No newline at end of file
@@ -0,0 +1,178 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Vectorized marching cubes using numpy only.
+
+The triangle table is generated when the module is imported rather than being typed in. Each face of a cell is treated
+separately: the crossing points on the face edges are joined into segments that cut off the inside corners, and the
+segments from all six faces are chained into closed loops which are then fan triangulated. Ambiguous faces (two
+diagonally opposite inside corners) always separate the inside corners. The rule only depends on the face itself, so
+neighbouring cells always agree and the resulting surface is watertight.
+'''
+
+import numpy as np
+
+# Corner i of a cell is offset by (i & 1, (i >> 1) & 1, (i >> 2) & 1) from the cell origin
+_CORNERS = [(i & 1, (i >> 1) & 1, (i >> 2) & 1) for i in range(8)]
+
+# The 12 cell edges as (low corner, high corner) pairs
+_EDGES = [(a, b) for a in range(8) for b in range(a + 1, 8) if bin(a ^ b).count("1") == 1]
+
+# Axis along which each edge runs, and offset of its low corner from the cell origin
+_EDGE_AXIS = np.array([(a ^ b).bit_length() - 1 for a, b in _EDGES])
+_EDGE_OFFSET = np.array([_CORNERS[a] for a, b in _EDGES])
+
+
+def _face_cycles():
+    '''
+    The corners of each cell face, ordered anticlockwise as seen from outside the cell.
+    '''
+    cycles = []
+    for axis in range(3):
+        p, q = (axis + 1) % 3, (axis + 2) % 3
+        for side in (0, 1):
+            square = [(0, 0), (1, 0), (1, 1), (0, 1)]
+            if side == 0:
+                square.reverse()
+            cycle = []
+            for a, b in square:
+                offset = [0, 0, 0]
+                offset[axis], offset[p], offset[q] = side, a, b
+                cycle.append(_CORNERS.index(tuple(offset)))
+            cycles.append(cycle)
+    return cycles
+
+
+def _case_polygons(case):
+    '''
+    Closed loops of edge indices for one cube case. Corner i is inside if bit i of case is set.
+    '''
+    inside = [bool(case >> i & 1) for i in range(8)]
+    links = {}
+    for cycle in _face_cycles():
+        entering = []
+        exiting = []
+        for j in range(4):
+            a, b = cycle[j], cycle[(j + 1) % 4]
+            if inside[a] != inside[b]:
+                edge = _EDGES.index((min(a, b), max(a, b)))
+                (entering if inside[b] else exiting).append((j, edge))
+        # Each run of inside corners is entered at one crossing and left at the next exiting crossing
+        for j, edge in entering:
+            following = [e for k, e in exiting if k > j] or [e for k, e in exiting]
+            links[following[0]] = edge
+
+    polygons = []
+    while links:
+        start, edge = links.popitem()
+        loop = [start]
+        while edge != start:
+            loop.append(edge)
+            edge = links.pop(edge)
+        polygons.append(loop)
+    return polygons
+
+
+def _build_tables():
+    triangles = []
+    for case in range(256):
+        tris = []
+        for loop in _case_polygons(case):
+            tris.extend((loop[0], loop[i + 1], loop[i]) for i in range(1, len(loop) - 1))
+        triangles.append(tris)
+    max_tris = max(len(t) for t in triangles)
+    table = np.full((256, max_tris, 3), -1, dtype=np.int64)
+    counts = np.zeros(256, dtype=np.int64)
+    for case, tris in enumerate(triangles):
+        counts[case] = len(tris)
+        if tris:
+            table[case, :len(tris)] = tris
+    return table, counts
+
+
+_TRI_TABLE, _TRI_COUNT = _build_tables()
+
+
+def _gradient_at(values, i, j, k):
+    '''
+    Central difference gradient of values at integer grid points, one sided at the boundary.
+    '''
+    shape = values.shape
+    result = []
+    for axis, index in enumerate((i, j, k)):
+        lo = np.maximum(index - 1, 0)
+        hi = np.minimum(index + 1, shape[axis] - 1)
+        a = [i, j, k]
+        b = [i, j, k]
+        a[axis] = hi
+        b[axis] = lo
+        result.append((values[tuple(a)] - values[tuple(b)]) / np.maximum(hi - lo, 1))
+    return np.stack(result, axis=-1)
+
+
+def marching_cubes(values, level=0.0, chunk_size=16):
+    '''
+    Extract the isosurface values == level from a 3D grid of samples.
+
+    Cells are processed in slabs of chunk_size along the first axis, so the temporary arrays only ever cover one slab.
+    Vertices lie on grid edges and are merged, so each grid edge crossing produces exactly one vertex.
+
+    Args:
+        values: 3D array of samples, indexed [i, j, k].
+        level: the iso level.
+        chunk_size: number of cell layers processed at a time.
+
+    Returns:
+        (vertices, faces, normals). vertices is an (n, 3) float array in grid index coordinates, faces is an (m, 3) int
+        array of vertex indices, normals is an (n, 3) array of unit gradient directions (pointing towards increasing
+        values) in grid index coordinates. Triangles are wound anticlockwise when viewed from the direction of the
+        normal.
+    '''
+    shape = values.shape
+    point_count = shape[0] * shape[1] * shape[2]
+    edge_ids = []
+
+    for i0 in range(0, shape[0] - 1, chunk_size):
+        i1 = min(i0 + chunk_size, shape[0] - 1)
+        inside = values[i0:i1 + 1] < level
+        cases = np.zeros((i1 - i0, shape[1] - 1, shape[2] - 1), dtype=np.uint8)
+        for bit, (dx, dy, dz) in enumerate(_CORNERS):
+            cases |= inside[dx:dx + i1 - i0, dy:dy + shape[1] - 1, dz:dz + shape[2] - 1].astype(np.uint8) << bit
+
+        ci, cj, ck = np.nonzero(_TRI_COUNT[cases])
+        if len(ci) == 0:
+            continue
+        cell_cases = cases[ci, cj, ck]
+        counts = _TRI_COUNT[cell_cases]
+        valid = np.arange(_TRI_TABLE.shape[1]) < counts[:, None]
+        edges = _TRI_TABLE[cell_cases][valid]
+        cell = np.repeat(np.stack((ci + i0, cj, ck), axis=-1), counts, axis=0)
+
+        corner = cell[:, None, :] + _EDGE_OFFSET[edges]
+        linear = np.ravel_multi_index((corner[..., 0], corner[..., 1], corner[..., 2]), shape)
+        edge_ids.append(_EDGE_AXIS[edges] * point_count + linear)
+
+    if not edge_ids:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64), np.zeros((0, 3))
+
+    unique_ids, faces = np.unique(np.concatenate(edge_ids), return_inverse=True)
+    faces = faces.reshape(-1, 3)
+
+    axis = unique_ids // point_count
+    i, j, k = np.unravel_index(unique_ids % point_count, shape)
+    step = np.eye(3, dtype=np.int64)[axis]
+    i1, j1, k1 = i + step[:, 0], j + step[:, 1], k + step[:, 2]
+
+    va = values[i, j, k].astype(np.float64)
+    vb = values[i1, j1, k1].astype(np.float64)
+    t = (level - va) / (vb - va)
+    vertices = np.stack((i, j, k), axis=-1) + t[:, None] * step
+
+    normals = (1 - t)[:, None] * _gradient_at(values, i, j, k) + t[:, None] * _gradient_at(values, i1, j1, k1)
+    lengths = np.linalg.norm(normals, axis=-1)
+    normals /= np.where(lengths > 0, lengths, 1)[:, None]
+
+    return vertices, faces, normals
@@ -0,0 +1,100 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Vectorized marching squares using numpy only, used to draw contour lines on sampled surfaces.
+
+Cell corners are numbered 0 = (r, c), 1 = (r, c+1), 2 = (r+1, c+1), 3 = (r+1, c) and cell edges 0 = corners 0-1,
+1 = corners 1-2, 2 = corners 3-2, 3 = corners 0-3. Ambiguous cells (two diagonally opposite corners above the level)
+always separate the corners that are above the level.
+'''
+
+import numpy as np
+
+_EDGE_CORNERS = [(0, 1), (1, 2), (3, 2), (0, 3)]
+
+
+def _build_table():
+    table = np.full((16, 2, 2), -1, dtype=np.int64)
+    counts = np.zeros(16, dtype=np.int64)
+    for case in range(16):
+        above = [bool(case >> i & 1) for i in range(4)]
+        crossed = [e for e, (a, b) in enumerate(_EDGE_CORNERS) if above[a] != above[b]]
+        if case == 5:
+            segments = [(3, 0), (1, 2)]
+        elif case == 10:
+            segments = [(0, 1), (2, 3)]
+        elif crossed:
+            segments = [tuple(crossed)]
+        else:
+            segments = []
+        counts[case] = len(segments)
+        if segments:
+            table[case, :len(segments)] = segments
+    return table, counts
+
+
+_SEGMENT_TABLE, _SEGMENT_COUNT = _build_table()
+
+
+def marching_squares(values, positions, levels):
+    '''
+    Find the contour lines of a grid of values.
+
+    Args:
+        values: (rows, cols) array of values.
+        positions: (rows, cols, 3) array giving the position of each grid point. Contour vertices are interpolated
+            linearly between these positions.
+        levels: sequence of contour levels.
+
+    Returns:
+        (vertices, edges). vertices is an (n, 3) array of positions, edges is an (m, 2) array of vertex indices. Segments
+        that meet at a grid edge share a vertex, so the edges form connected polylines.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    rows, cols = values.shape
+    horizontal_count = rows * (cols - 1)
+    edge_count = horizontal_count + (rows - 1) * cols
+
+    # Global ids of the four edges of every cell, indexed [cell edge, r, c]
+    r, c = np.meshgrid(np.arange(rows - 1), np.arange(cols - 1), indexing='ij')
+    cell_edges = np.stack((r * (cols - 1) + c,
+                           horizontal_count + r * cols + c + 1,
+                           (r + 1) * (cols - 1) + c,
+                           horizontal_count + r * cols + c))
+
+    edge_ids = []
+    for index, level in enumerate(levels):
+        above = values >= level
+        cases = (above[:-1, :-1].astype(np.int64) | above[:-1, 1:] << 1 | above[1:, 1:] << 2 | above[1:, :-1] << 3)
+        cr, cc = np.nonzero(_SEGMENT_COUNT[cases])
+        if len(cr) == 0:
+            continue
+        cell_cases = cases[cr, cc]
+        counts = _SEGMENT_COUNT[cell_cases]
+        valid = np.arange(2) < counts[:, None]
+        segments = _SEGMENT_TABLE[cell_cases][valid]
+        ids = cell_edges[segments, np.repeat(cr, counts)[:, None], np.repeat(cc, counts)[:, None]]
+        edge_ids.append(ids + index * edge_count)
+
+    if not edge_ids:
+        return np.zeros((0, 3)), np.zeros((0, 2), dtype=np.int64)
+
+    unique_ids, edges = np.unique(np.concatenate(edge_ids), return_inverse=True)
+    edges = edges.reshape(-1, 2)
+
+    level = np.asarray(levels, dtype=np.float64)[unique_ids // edge_count]
+    local = unique_ids % edge_count
+    is_horizontal = local < horizontal_count
+    ra = np.where(is_horizontal, local // (cols - 1), (local - horizontal_count) // cols)
+    ca = np.where(is_horizontal, local % (cols - 1), (local - horizontal_count) % cols)
+    rb = np.where(is_horizontal, ra, ra + 1)
+    cb = np.where(is_horizontal, ca + 1, ca)
+
+    va = values[ra, ca]
+    vb = values[rb, cb]
+    t = ((level - va) / (vb - va))[:, None]
+    vertices = (1 - t) * positions[ra, ca] + t * positions[rb, cb]
+    return vertices, edges
@@ -3,17 +3,31 @@
 # Copyright (c) 2025, Martin McBride
 # License: GNU GPL V 3
 
+import hashlib
 import math
+import os
+import tempfile
 import bpy
 import bmesh
+import numpy as np
 from mathutils import Vector
+from genpyblender import utils, camera, make_image, colormap as colormaps
+from genpyblender.camera import align_perpendicular_to_camera
+from genpyblender.expression import as_function
+from genpyblender.marching_cubes import marching_cubes
+from genpyblender.marching_squares import marching_squares
+
+# OpenVDB is optional. Blender 4.4 and later bundle it as openvdb, earlier versions as pyopenvdb. Without it, volume
+# plots use a point density texture instead.
+try:
+    import openvdb
+except ImportError:
+    try:
+        import pyopenvdb as openvdb
+    except ImportError:
+        openvdb = None
 
 
-def align_perpendicular_to_camera(object, camera):
-    view_vector = camera.matrix_world.to_quaternion() @ Vector((0, 0, 1))
-    object.rotation_euler = view_vector.to_track_quat('Z', 'Y').to_euler()
-    bpy.context.view_layer.update()
-
 def create_diffuse_material(mesh, colour, name):
     material = bpy.data.materials.new(name = name)
     material.diffuse_color = colour
@@ -22,6 +36,120 @@ def create_diffuse_material(mesh, colour, name):
 def default_div_formatter(value):
     return f"{value: .1f}"
 
+def _evaluate(function, *args):
+    '''
+    Evaluate a plot function over numpy arrays. The function is first called once with the whole arrays, which works for
+    functions written with numpy operations. If that fails (for example a function using math.exp) the function is
+    called once per element instead.
+
+    Args:
+        function: the function to evaluate.
+        args: arrays of arguments, all the same shape.
+
+    Returns:
+        Array of results, the same shape as the arguments
+    '''
+    shape = np.shape(args[0])
+    try:
+        result = np.asarray(function(*args), dtype=np.float64)
+        return np.broadcast_to(result, shape).copy()
+    except (TypeError, ValueError):
+        return np.vectorize(function, otypes=[np.float64])(*args)
+
+def _forward_scale(scale, threshold, values):
+    '''
+    Map graph values to the linear space used by an axis scale.
+    '''
+    if scale == "linear":
+        return values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if scale == "log":
+            return np.log10(values)
+        if scale == "symlog":
+            return np.sign(values) * np.log10(1 + np.abs(values) / threshold)
+    raise ValueError(f"Unknown axis scale {scale}")
+
+def _inverse_scale(scale, threshold, values):
+    '''
+    Inverse of _forward_scale.
+    '''
+    if scale == "linear":
+        return values
+    if scale == "log":
+        return 10 ** values
+    if scale == "symlog":
+        return np.sign(values) * threshold * (10 ** np.abs(values) - 1)
+    raise ValueError(f"Unknown axis scale {scale}")
+
+def _unwrap(value):
+    '''
+    Convert 0-d arrays to floats, so scalar inputs give scalar results.
+    '''
+    return value.item() if value.ndim == 0 else value
+
+def _wrap_grid(grid, wrap_rows, wrap_cols):
+    '''
+    Repeat the first row and/or column of a periodic grid at the end, giving the grid without the seam.
+    '''
+    if wrap_cols:
+        grid = np.concatenate((grid, grid[:, :1]), axis=1)
+    if wrap_rows:
+        grid = np.concatenate((grid, grid[:1]), axis=0)
+    return grid
+
+# Keys of the scene cost dictionaries returned by Axes.estimate and BasePlot.estimate
+COST_KEYS = ("objects", "vertices", "materials", "booleans", "labels")
+
+# Vertices added by the primitive operators. Cylinders use the default 32 segments.
+_CYLINDER_VERTICES = 64
+_PLANE_VERTICES = 4
+_CUBE_VERTICES = 8
+
+def _cost(objects=0, vertices=0, materials=0, booleans=0, labels=0):
+    return {"objects": objects, "vertices": vertices, "materials": materials, "booleans": booleans, "labels": labels}
+
+def _add_costs(*costs):
+    return {key: sum(cost[key] for cost in costs) for key in COST_KEYS}
+
+def _check_budget(cost, budget, name):
+    '''
+    Raise ValueError if any count in cost is greater than the limit for that count in budget.
+
+    Args:
+        cost: cost dictionary.
+        budget: dictionary of maximum counts, using any of the keys in COST_KEYS, or None for no limits.
+        name: name used in the error message.
+
+    Returns:
+        cost
+    '''
+    if budget is None:
+        return cost
+    unknown = set(budget) - set(COST_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown budget keys {sorted(unknown)}, expected some of {COST_KEYS}")
+    over = [f"{key} {cost[key]} > {limit}" for key, limit in budget.items() if cost[key] > limit]
+    if over:
+        raise ValueError(f"{name} exceeds its budget: " + ", ".join(over))
+    return cost
+
+def estimate_scene(axes, plots, budget=None):
+    '''
+    Estimate the total cost of drawing axes and a list of plots, without building anything.
+
+    Args:
+        axes: the Axes, or None.
+        plots: sequence of plots.
+        budget: optional dictionary of maximum counts for the whole scene, see BasePlot.estimate.
+
+    Returns:
+        Cost dictionary
+    '''
+    costs = [plot.estimate() for plot in plots]
+    if axes is not None:
+        costs.append(axes.estimate())
+    return _check_budget(_add_costs(_cost(), *costs), budget, "Scene")
+
 class Axes():
 
     def __init__(self):
@@ -42,6 +170,16 @@ class Axes():
         self.start = (0, 0, 0)
         self.extent = (1, 1, 1)
         self.divisions = (0.2, 0.2, 0.2)
+        self.scales = ("linear", "linear", "linear")
+        self.symlog_thresholds = (1, 1, 1)
+
+        # Cached (scale, offset) arrays mapping scaled graph coordinates to blender coordinates
+        self._affine = None
+        self._affine_floats = None
+
+        # Placement of the axes in the scene. Objects are built around the origin and then moved by a layout
+        self.offset = (0, 0, 0)
+        self.scale = 1
 
         self.x_div_formatter = default_div_formatter
         self.y_div_formatter = default_div_formatter
@@ -58,6 +196,8 @@ class Axes():
         self.axis_offset_y = (0, -1.4, -1.1)
         self.axis_offset_z = (1.4, 1.1, 0)
 
+        self.budget = None
+
     def of_start(self, start):
         '''
         Sets the start value of the axes
@@ -69,6 +209,7 @@ class Axes():
             self
         '''
         self.start = start
+        self._affine = None
         return self
 
     def of_extent(self, extent):
@@ -82,6 +223,25 @@ class Axes():
             self
         '''
         self.extent = extent
+        self._affine = None
+        return self
+
+    def with_scales(self, scales, symlog_thresholds=(1, 1, 1)):
+        '''
+        Set the scale of each axis
+
+        Args:
+            scales: (x, y, z) scales, each one of "linear", "log" or "symlog". A log axis must have a start value
+                greater than zero, and its divisions are placed at powers of 10.
+            symlog_thresholds: (x, y, z) values for symlog axes. A symlog axis is roughly linear for values smaller than
+                the threshold and logarithmic for larger values, and can include zero and negative values.
+
+        Returns:
+            self
+        '''
+        self.scales = tuple(scales)
+        self.symlog_thresholds = tuple(symlog_thresholds)
+        self._affine = None
         return self
 
     def with_divisions(self, divisions):
@@ -106,25 +266,108 @@ class Axes():
     def with_axis_labels(self, labels):
         self.axis_labels = tuple(labels)
 
+    def with_placement(self, offset, scale=1):
+        '''
+        Set where the axes are placed in the scene, used when several axes share one scene (see layout.py). The axes
+        and plots are still built in the -1 to 1 cube, and the layout moves them into place afterwards.
+
+        Args:
+            offset: (x, y, z) position of the centre of the axes.
+            scale: size of the axes relative to the default size.
+
+        Returns:
+            self
+        '''
+        self.offset = tuple(offset)
+        self.scale = scale
+        return self
+
+    def with_budget(self, budget):
+        '''
+        Set limits on the cost of drawing the axes. draw raises ValueError, before creating anything, if the estimated
+        cost is over budget.
+
+        Args:
+            budget: dictionary of maximum counts, see estimate.
+
+        Returns:
+            self
+        '''
+        self.budget = budget
+        return self
+
+    def estimate(self, budget=None):
+        '''
+        Estimate the cost of drawing the axes from the current extent and divisions, without creating anything.
+
+        Args:
+            budget: optional dictionary of maximum counts, using any of the keys "objects", "vertices", "materials",
+                "booleans" and "labels". ValueError is raised if the estimate is over budget.
+
+        Returns:
+            Dictionary of counts. labels is the number of text objects, each of which runs the text operator and a
+            view layer update. Text objects are not included in the vertex count.
+        '''
+        positions = [[self._to_blender(i, v) for v in values] for i, values in enumerate(self._div_values())]
+        nx, ny, nz = (len(p) for p in positions)
+        labels = (sum(1 for pa in positions[0] if pa < 0.9) + sum(1 for pa in positions[1] if -0.9 < pa < 0.9)
+                  + sum(1 for pa in positions[2] if pa > -0.9) + 3)
+        cylinders = 2 * (nx + ny + nz) + 3
+        cost = _cost(objects=3 + cylinders + labels, vertices=3 * _PLANE_VERTICES + cylinders * _CYLINDER_VERTICES,
+                     materials=3 + cylinders + labels, labels=labels)
+        return _check_budget(cost, budget, "Axes")
+
+    def blender_to_world(self, points):
+        '''
+        Convert a (..., 3) array of blender coordinates (in the -1 to 1 cube) to scene coordinates, taking account of the
+        placement of the axes.
+        '''
+        return np.asarray(points, dtype=np.float64) * self.scale + np.array(self.offset, dtype=np.float64)
+
+    def _get_affine(self):
+        if self._affine is None:
+            start = np.array([_forward_scale(s, t, v) for s, t, v in zip(self.scales, self.symlog_thresholds, self.start)],
+                             dtype=np.float64)
+            end = np.array([_forward_scale(s, t, v + e) for s, t, v, e in
+                            zip(self.scales, self.symlog_thresholds, self.start, self.extent)], dtype=np.float64)
+            scale = (np.array(self.axis_end, dtype=np.float64) - np.array(self.axis_start)) / (end - start)
+            self._affine = (scale, np.array(self.axis_start, dtype=np.float64) - start * scale)
+            # Plain float copies for the scalar fast path
+            self._affine_floats = (scale.tolist(), self._affine[1].tolist())
+        return self._affine
+
+    def _to_blender(self, axis, values):
+        # Fast path for the scalar conversions done per segment when drawing lines
+        if isinstance(values, (int, float)) and self.scales[axis] == "linear":
+            if self._affine is None:
+                self._get_affine()
+            scale, offset = self._affine_floats
+            return values * scale[axis] + offset[axis]
+        scale, offset = self._get_affine()
+        values = _forward_scale(self.scales[axis], self.symlog_thresholds[axis], np.asarray(values, dtype=np.float64))
+        return _unwrap(values * scale[axis] + offset[axis])
+
+    def _to_graph(self, axis, values):
+        if isinstance(values, (int, float)) and self.scales[axis] == "linear":
+            if self._affine is None:
+                self._get_affine()
+            scale, offset = self._affine_floats
+            return (values - offset[axis]) / scale[axis]
+        scale, offset = self._get_affine()
+        values = (np.asarray(values, dtype=np.float64) - offset[axis]) / scale[axis]
+        return _unwrap(_inverse_scale(self.scales[axis], self.symlog_thresholds[axis], values))
+
     def convert_points_graph_to_blender(self, x, y, z):
-        end = tuple([e + s for s, e in zip(self.start, self.extent)])
-        xo = ((x - self.start[0]) * (self.axis_end[0] - self.axis_start[0]) / (
-                    end[0] - self.start[0])) + self.axis_start[0]
-        yo = ((y - self.start[1]) * (self.axis_end[1] - self.axis_start[1]) / (
-                    end[1] - self.start[1])) + self.axis_start[1]
-        zo = ((z - self.start[2]) * (self.axis_end[2] - self.axis_start[2]) / (
-                    end[2] - self.start[2])) + self.axis_start[2]
-        return xo, yo, zo
+        '''
+        Convert graph coordinates to blender coordinates. x, y and z can be numbers or numpy arrays of any shape.
+        '''
+        return self._to_blender(0, x), self._to_blender(1, y), self._to_blender(2, z)
 
     def convert_points_blender_to_graph(self, xo, yo, zo):
-        end = tuple([e + s for s, e in zip(self.start, self.extent)])
-        x = ((xo - self.axis_start[0]) * (end[0] - self.start[0]) / (
-                    self.axis_end[0] - self.axis_start[0])) + self.start[0]
-        y = ((yo - self.axis_start[1]) * (end[1] - self.start[1]) / (
-                    self.axis_end[1] - self.axis_start[1])) + self.start[1]
-        z = ((zo - self.axis_start[2]) * (end[2] - self.start[2]) / (
-                    self.axis_end[2] - self.axis_start[2])) + self.start[2]
-        return x, y, z
+        '''
+        Convert blender coordinates to graph coordinates. xo, yo and zo can be numbers or numpy arrays of any shape.
+        '''
+        return self._to_graph(0, xo), self._to_graph(1, yo), self._to_graph(2, zo)
 
     def _get_divs(self, start, end, div):
         divs = []
@@ -134,13 +377,17 @@ class Axes():
             n += div
         return divs
 
-    def _set_divisions(self):
+    def _get_log_divs(self, start, end):
+        return [10.0**n for n in range(math.ceil(math.log10(start)), math.floor(math.log10(end)) + 1)]
+
+    def _div_values(self):
         end = tuple([e + s for s, e in zip(self.start, self.extent)])
-        div_values = [self._get_divs(self.start[i], end[i], self.divisions[i]) for i in range(3)]
-        x_positions = tuple([self.convert_points_graph_to_blender(v, 0, 0)[0] for v in div_values[0]])
-        y_positions = tuple([self.convert_points_graph_to_blender(0, v, 0)[1] for v in div_values[1]])
-        z_positions = tuple([self.convert_points_graph_to_blender(0, 0, v)[2] for v in div_values[2]])
-        self.div_positions = (x_positions, y_positions, z_positions)
+        return [self._get_log_divs(self.start[i], end[i]) if self.scales[i] == "log"
+                else self._get_divs(self.start[i], end[i], self.divisions[i]) for i in range(3)]
+
+    def _set_divisions(self):
+        div_values = self._div_values()
+        self.div_positions = tuple(tuple(self._to_blender(i, v) for v in div_values[i]) for i in range(3))
         self.steps = tuple(div_values)
 
     def add_axis_text(self, value, location):
@@ -231,6 +478,8 @@ class Axes():
         self.add_axis_text(self.axis_labels[2], self.axis_offset_z)
 
     def draw(self):
+        if self.budget is not None:
+            self.estimate(self.budget)
         self._set_divisions()
         self.plane("x")
         self.plane("y")
@@ -238,6 +487,9 @@ class Axes():
         self.draw_axes()
 
 
+# Maximum number of segments per grid line when the precision is "auto", the same as the default precision
+AUTO_LINE_SEGMENTS = 20
+
 class BasePlot:
 
     def __init__(self, axes):
@@ -248,9 +500,64 @@ class BasePlot:
         self.clip_to_axes = False
         self.line_color = (0, 0, 0.5, 0)
         self.line_radius = 0.01
+        self.auto_precision = False
+        self.facet_pixels = 8
+        self.smooth_shading = True
+        self.color_scalar = None
+        self.color_range = None
+        self.material = None
+        self.contour_levels = ()
+        self.contour_color = (0, 0, 0, 1)
+        self.contour_radius = 0.01
+        self.budget = None
+
+    def fill(self, colormap, scalar=None, value_range=None):
+        '''
+        Set the fill colours of the plot
+
+        Args:
+            colormap: colormap function.
+            scalar: if None, vertex colours are calculated from the height of the plot. Otherwise a scalar value is
+                stored with each vertex and mapped to colours by the material. It can be "z" (height in graph units),
+                "gradient" (magnitude of the gradient of the plot function) or a function f(x, y, z) of graph
+                coordinates. The colours can then be changed cheaply with recolor.
+            value_range: (min, max) scalar values mapped to the ends of the colormap. Defaults to the range of the
+                values.
 
-    def fill(self, colormap):
+        Returns:
+            self
+        '''
         self.colormap = colormap
+        self.color_scalar = scalar
+        self.color_range = value_range
+        return self
+
+    def recolor(self, colormap=None, value_range=None):
+        '''
+        Change the colormap or value range of a plot that was filled using a scalar. This only changes the material
+        nodes, the mesh is unchanged.
+
+        Args:
+            colormap: new colormap, or None to keep the current one.
+            value_range: new (min, max) value range, or None to keep the current one.
+
+        Returns:
+            self
+
+        Raises:
+            ValueError: if the plot has not been drawn with a scalar fill.
+        '''
+        material = self.material
+        if material is None or not material.use_nodes or "plot_map_range" not in material.node_tree.nodes:
+            raise ValueError("recolor needs a plot drawn with fill(..., scalar=...)")
+        nodes = self.material.node_tree.nodes
+        if colormap is not None:
+            self.colormap = colormap
+            utils.set_color_ramp(nodes["plot_color_ramp"].color_ramp, colormaps.color_stops(colormap))
+        if value_range is not None:
+            self.color_range = value_range
+            nodes["plot_map_range"].inputs["From Min"].default_value = value_range[0]
+            nodes["plot_map_range"].inputs["From Max"].default_value = value_range[1]
         return self
 
     def stroke(self, color, line_width=0.01):
@@ -263,6 +570,198 @@ class BasePlot:
         self.clip_to_axes = True
         return self
 
+    def contour(self, levels, color=(0, 0, 0, 1), line_width=0.01):
+        '''
+        Draw contour lines of constant z on a surface plot. All the contours are drawn as a single curve object.
+
+        Args:
+            levels: sequence of z values, in graph coordinates.
+            color: line color.
+            line_width: line radius.
+
+        Returns:
+            self
+        '''
+        self.contour_levels = tuple(levels)
+        self.contour_color = color
+        self.contour_radius = line_width
+        return self
+
+    def _contour_geometry(self, grid):
+        '''
+        Contour line vertices and edges for a (rows, cols, 3) grid of blender coordinates.
+        '''
+        levels = [self.axes.convert_points_graph_to_blender(0, 0, level)[2] for level in self.contour_levels]
+        vertices, edges = marching_squares(grid[..., 2], grid, levels)
+        if self.clip_to_axes:
+            inside = np.all(np.abs(vertices) <= 1, axis=-1)
+            edges = edges[inside[edges].all(axis=-1)]
+        return vertices, edges
+
+    def _draw_contours(self, grid):
+        '''
+        Draw the contour lines of a (rows, cols, 3) grid of blender coordinates, using the grid that was used to build
+        the surface.
+        '''
+        return self._create_contour_object(*self._contour_geometry(grid))
+
+    def _create_contour_object(self, vertices, edges):
+        '''
+        Create a single bevelled curve object from contour line geometry.
+        '''
+        if len(edges) == 0:
+            return None
+
+        obj = utils.create_mesh_object("contours", vertices, edges=edges)
+        bpy.ops.object.convert(target='CURVE')
+        obj = bpy.context.active_object
+        obj.data.bevel_depth = self.contour_radius
+        obj.data.bevel_resolution = 4
+        mat = bpy.data.materials.new("col")
+        mat.diffuse_color = self.contour_color
+        obj.active_material = mat
+        return obj
+
+    def with_budget(self, budget):
+        '''
+        Set limits on the cost of the plot. plot raises ValueError, before creating anything, if the estimated cost is
+        over budget.
+
+        Args:
+            budget: dictionary of maximum counts, see estimate.
+
+        Returns:
+            self
+        '''
+        self.budget = budget
+        return self
+
+    def estimate(self, budget=None):
+        '''
+        Estimate the cost of the plot from its current settings (precision, clip, stroke, fill and contours), without
+        creating anything. If the precision is "auto" the camera must already exist.
+
+        Args:
+            budget: optional dictionary of maximum counts, using any of the keys "objects", "vertices", "materials",
+                "booleans" and "labels". ValueError is raised if the estimate is over budget.
+
+        Returns:
+            Dictionary of counts. Every clipped object adds a boolean, and also a hidden cube object. The vertices of
+            implicit surfaces and contour lines depend on the function, so they are not counted.
+        '''
+        self._resolve_precision()
+        return _check_budget(self._cost(), budget, type(self).__name__)
+
+    def _check_plot_budget(self):
+        if self.budget is not None:
+            self.estimate(self.budget)
+
+    def _cost(self):
+        '''
+        Estimated cost of the plot, overridden by each plot type.
+        '''
+        return _cost()
+
+    def _crop_cost(self, count):
+        '''
+        Cost of cropping count objects, if the plot is clipped.
+        '''
+        if not self.clip_to_axes:
+            return _cost()
+        return _cost(objects=count, vertices=count * _CUBE_VERTICES, booleans=count)
+
+    def _segment_cost(self, segments):
+        '''
+        Cost of drawing line segments as separate cylinders.
+        '''
+        return _add_costs(_cost(objects=segments, vertices=segments * _CYLINDER_VERTICES, materials=segments),
+                          self._crop_cost(segments))
+
+    def _surface_cost(self, vertices, objects=1):
+        '''
+        Cost of surface meshes with the given total number of vertices, including fill materials and contours.
+        '''
+        filled = self.colormap is not None or self.color_scalar is not None
+        contours = 1 if self.contour_levels else 0
+        return _add_costs(_cost(objects=objects + contours, vertices=vertices,
+                                materials=(objects if filled else 0) + contours),
+                          self._crop_cost(objects))
+
+    def with_smooth_shading(self, smooth=True):
+        '''
+        Set whether surfaces are smooth shaded. Smooth shading uses vertex normals calculated from the sampled surface,
+        so it doesn't add any vertices.
+
+        Args:
+            smooth: True for smooth shading (the default), False for flat shading.
+
+        Returns:
+            self
+        '''
+        self.smooth_shading = smooth
+        return self
+
+    def with_facet_pixels(self, pixels):
+        '''
+        Set the target size of facets or line segments when the plot precision is "auto"
+
+        Args:
+            pixels: maximum size, in output pixels, of each facet or segment. Defaults to 8.
+
+        Returns:
+            self
+        '''
+        self.facet_pixels = pixels
+        return self
+
+    def _set_precision(self, precision):
+        self.auto_precision = precision == "auto"
+        if not self.auto_precision:
+            self.precision = precision
+
+    def _precision_for_length(self, pixels, min_precision=4, max_precision=2000):
+        '''
+        Number of divisions needed so that a line of the given projected length has segments no longer than facet_pixels.
+        '''
+        return int(min(max_precision, max(min_precision, math.ceil(pixels / self.facet_pixels))))
+
+    def _projected_grid_precision(self, grid):
+        '''
+        Precision needed for a surface, given a coarse (rows, cols, 3) grid sampled from it. The longest projected grid
+        line in either direction sets the precision.
+        '''
+        pixels = camera.project_to_pixels(bpy.data.objects.get("Camera"), self.axes.blender_to_world(grid))
+        along_rows = np.linalg.norm(np.diff(pixels, axis=1), axis=-1).sum(axis=1).max()
+        along_cols = np.linalg.norm(np.diff(pixels, axis=0), axis=-1).sum(axis=0).max()
+        return self._precision_for_length(max(along_rows, along_cols))
+
+    def _line_segments(self):
+        '''
+        Number of cylinder segments along each grid line drawn by stroke. This is the precision, except that an "auto"
+        precision (which can be up to 2000 for a large image) is capped at AUTO_LINE_SEGMENTS, because every segment
+        is a separate object (and a boolean when clipped).
+        '''
+        if self.auto_precision:
+            return min(self.precision, AUTO_LINE_SEGMENTS)
+        return self.precision
+
+    def _resolve_precision(self):
+        '''
+        If the precision is "auto", set it from the projected size of the plot in the current camera and output
+        resolution. The camera must be created before the plot.
+        '''
+        if self.auto_precision:
+            self.precision = self._estimate_precision()
+
+    def _estimate_precision(self):
+        '''
+        Precision from the projected size of the axes box. Plot types override this with an estimate based on a coarse
+        sample of the plot itself.
+        '''
+        corners = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+        pixels = camera.project_to_pixels(bpy.data.objects.get("Camera"), self.axes.blender_to_world(corners))
+        return self._precision_for_length((pixels.max(axis=0) - pixels.min(axis=0)).max())
+
     def _is_crop_face(self, face_verts):
         """
         When a 3D plot is cropped to the axes, extra faces (crop faces) are created where the plot intersect the crop box. Thes faces need
@@ -311,6 +810,61 @@ class BasePlot:
         bmesh.ops.delete(bm, geom=crop_faces, context='FACES_ONLY')
         bm.to_mesh(plot_obj.data)
 
+    def _gradient_magnitude(self, x, y, z):
+        '''
+        Magnitude of the gradient of the plot function at arrays of graph coordinates, for colouring by "gradient".
+        '''
+        raise ValueError(f"{type(self).__name__} does not support colouring by gradient")
+
+    def _scalar_values(self, obj):
+        '''
+        Calculate the colouring scalar for each vertex of obj.
+        '''
+        mesh = obj.data
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coords)
+        coords = coords.reshape(-1, 3).astype(np.float64)
+        x, y, z = self.axes.convert_points_blender_to_graph(coords[:, 0], coords[:, 1], coords[:, 2])
+        if self.color_scalar == "z":
+            return z
+        if self.color_scalar == "gradient":
+            return self._gradient_magnitude(x, y, z)
+        return _evaluate(self.color_scalar, x, y, z)
+
+    def _apply_fill(self, obj):
+        '''
+        Colour obj, either by vertex colours or through a scalar attribute, depending on the fill settings.
+        '''
+        self._fill_objects([obj])
+
+    def _fill_objects(self, objects):
+        '''
+        Colour several objects that make up one plot (eg the tiles of a tiled surface). When colouring by a scalar, the
+        default value range covers all the objects, and they share one material, so recolor changes them all.
+        '''
+        if self.color_scalar is None:
+            if self.colormap:
+                for obj in objects:
+                    bpy.context.view_layer.objects.active = obj
+                    self.apply_colormap(self.colormap)
+            return
+
+        low, high = np.inf, -np.inf
+        for obj in objects:
+            values = self._scalar_values(obj)
+            attribute = obj.data.attributes.new(name="plot_value", type='FLOAT', domain='POINT')
+            attribute.data.foreach_set("value", values.astype(np.float32))
+            if len(values) and not np.all(np.isnan(values)):
+                low = min(low, float(np.nanmin(values)))
+                high = max(high, float(np.nanmax(values)))
+        value_range = self.color_range
+        if value_range is None:
+            value_range = (low, high) if low <= high else (0, 1)
+        self.material = utils.create_colormap_material("Colormap Material", "plot_value",
+                                                       colormaps.color_stops(self.colormap), value_range)
+        for obj in objects:
+            obj.data.materials.append(self.material)
+
     def apply_colormap(self, colormap):
         bpy.ops.object.mode_set(mode='OBJECT')
 
@@ -322,21 +876,31 @@ class BasePlot:
         # Switch to Vertex Paint mode
         bpy.ops.object.mode_set(mode='VERTEX_PAINT')
 
-        # Set the active vertex color layer
-        active_vc_layer = graph_object.data.vertex_colors.active
-        if active_vc_layer is None:
-            active_vc_layer = graph_object.data.vertex_colors.new()
-
-        # Loop through the vertices and set them to color from map
-        for poly in graph_object.data.polygons:
-            for loop_index in poly.loop_indices:
-                loop = graph_object.data.loops[loop_index]
-                vertex_index = loop.vertex_index
-                vert = mesh.vertices[vertex_index]
-                # vert.co.z is the z-value of the graph element in blender coords, ie in the range -1 to +1.
-                # The colormap has input range 0 to 1. This code maps between the two.
-                color = colormap((vert.co.z + 1) / 2)
-                active_vc_layer.data[loop_index].color = color
+        # Set the active vertex color layer. Blender 3.2 and later can store one colour per vertex rather than one per
+        # face corner, which is a quarter of the size for a quad grid.
+        if hasattr(mesh, "color_attributes"):
+            active_vc_layer = mesh.color_attributes.active_color
+            if active_vc_layer is None:
+                active_vc_layer = mesh.color_attributes.new("Attribute", 'FLOAT_COLOR', 'POINT')
+                mesh.color_attributes.active_color = active_vc_layer
+            per_loop = active_vc_layer.domain == 'CORNER'
+        else:
+            active_vc_layer = mesh.vertex_colors.active
+            if active_vc_layer is None:
+                active_vc_layer = mesh.vertex_colors.new()
+            per_loop = True
+
+        # vert.co.z is the z-value of the graph element in blender coords, ie in the range -1 to +1.
+        # The colormap has input range 0 to 1. This code maps between the two.
+        # For a large surface, use fill(..., scalar="z") instead, which colours the mesh in the shader.
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coords)
+        colors = colormaps.map_values(colormap, (coords[2::3] + 1) / 2)
+        if per_loop:
+            loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+            mesh.loops.foreach_get("vertex_index", loop_vertices)
+            colors = colors[loop_vertices]
+        active_vc_layer.data.foreach_set("color", colors.ravel())
 
         # Create a new material
         mat = bpy.data.materials.new(name="Vertex Color Material")
@@ -372,6 +936,35 @@ class BasePlot:
 
         bpy.ops.object.mode_set(mode='OBJECT')
 
+    def _create_grid_object(self, name, grid, wrap_rows=False, wrap_cols=False):
+        '''
+        Create a mesh object from a (rows, cols, 3) grid of blender coordinates, with one quad per grid cell. If
+        wrap_rows or wrap_cols is set, the last row or column is also joined to the first.
+        '''
+        rows, cols, _ = grid.shape
+        faces = utils.grid_faces(rows, cols, wrap_rows, wrap_cols)
+        obj = utils.create_mesh_object(name, grid.reshape(-1, 3), faces)
+        if self.smooth_shading:
+            utils.set_custom_normals(obj.data, self._grid_normals(grid, wrap_rows, wrap_cols).reshape(-1, 3))
+        return obj
+
+    def _grid_normals(self, grid, wrap_rows=False, wrap_cols=False):
+        '''
+        Vertex normals of a (rows, cols, 3) grid from finite differences of the grid points. The normal follows the
+        face winding of grid_faces. Where the surface is degenerate (eg the pole of a sphere) the normal is left as
+        zero, so Blender uses its own normal.
+        '''
+        def difference(axis, wrap):
+            if wrap:
+                return (np.roll(grid, -1, axis=axis) - np.roll(grid, 1, axis=axis)) / 2
+            return np.gradient(grid, axis=axis)
+
+        along_cols = difference(1, wrap_cols)
+        along_rows = difference(0, wrap_rows)
+        normals = np.cross(along_cols, along_rows)
+        lengths = np.linalg.norm(normals, axis=-1, keepdims=True)
+        return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 1e-12)
+
     def plot(self):
         pass
 
@@ -381,28 +974,57 @@ class Plot3dZofXY(BasePlot):
         super().__init__(axes)
         self.function = lambda x, y: 0
         self.line_divisions = None
+        self.tile_size = None
+        self.join_tiles = True
 
     def of_function(self, function, precision=20, extent=()):
         '''
         Plot a function z = fn(x, y)
 
         Args:
-            function: the function to plot.
-            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots
+            function: the function to plot, or an expression string in x and y such as "exp(y)*cos(x)" (see
+                expression.py).
+            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots. If
+                "auto", the precision is chosen when the plot is drawn so that facets are about facet_pixels in size.
 
         Returns:
             self
         '''
 
-        self.function = function
-        self.precision = precision
+        self.function = as_function(function, ("x", "y"))
+        self._set_precision(precision)
+        return self
+
+    def tiled(self, tile_size=512, join=True):
+        '''
+        Build the surface in tiles of tile_size x tile_size cells, for very high precision plots. Each tile is sampled
+        separately, so the function is never evaluated over the whole grid at once. When the plot is clipped, tiles that
+        lie completely outside the axes box are skipped, and the cells that cross the box are clipped analytically as
+        each tile is built, so no boolean operation is ever run.
+
+        For the largest surfaces, colour the plot with fill(colormap, scalar="z"), which stores one float per vertex
+        and maps it to a colour in the shader, rather than a colour per vertex.
+
+        Args:
+            tile_size: number of grid cells along each side of a tile. Defaults to 512.
+            join: if True (the default), the tiles form one mesh with shared vertices along the tile edges. This holds
+                float32 vertex and normal buffers for the whole grid (24 bytes per grid point) plus the face arrays
+                until the mesh is created. If False, each tile is a separate object, which keeps the peak memory
+                bounded by the tile size.
+
+        Returns:
+            self
+        '''
+        self.tile_size = tile_size
+        self.join_tiles = join
         return self
 
     def draw_lines(self):
+        segments = self._line_segments()
         for x in self.axes.div_positions[0]:
-            for i in range(self.precision):
-                y0 = 2 * i / self.precision - 1
-                y1 = 2 * (i + 1) / self.precision - 1
+            for i in range(segments):
+                y0 = 2 * i / segments - 1
+                y1 = 2 * (i + 1) / segments - 1
 
                 xg, y0g, _ = self.axes.convert_points_blender_to_graph(x, y0, 0)
                 z0g = self.function(xg, y0g)
@@ -417,9 +1039,9 @@ class Plot3dZofXY(BasePlot):
                     self.crop_plot(bpy.context.active_object)
 
         for y in self.axes.div_positions[1]:
-            for i in range(self.precision):
-                x0 = 2 * i / self.precision - 1
-                x1 = 2 * (i + 1) / self.precision - 1
+            for i in range(segments):
+                x0 = 2 * i / segments - 1
+                x1 = 2 * (i + 1) / segments - 1
 
                 x0g, yg, _ = self.axes.convert_points_blender_to_graph(x0, y, 0)
                 z0g = self.function(x0g, yg)
@@ -433,25 +1055,177 @@ class Plot3dZofXY(BasePlot):
                 if self.clip_to_axes:
                     self.crop_plot(bpy.context.active_object)
 
-    def plot(self):
-        bpy.ops.mesh.primitive_grid_add(x_subdivisions=self.precision, y_subdivisions=self.precision,
-                                        location=(0, 0, 0))
+    def _sample_grid(self):
+        '''
+        Sample the function over a (precision+1) x (precision+1) grid covering the axes.
 
-        bpy.ops.object.mode_set(mode='EDIT')
+        :return: (rows, cols, 3) array of blender coordinates, rows follow y and columns follow x.
+        '''
+        return self._sample_tile(slice(None), slice(None))
 
-        obj = bpy.context.active_object
-        mesh = obj.data
+    def _grid_size(self):
+        '''
+        Number of (rows, cols) in the full sample grid.
+        '''
+        return self.precision + 1, self.precision + 1
 
-        bm = bmesh.from_edit_mesh(mesh)
+    def _sample_tile(self, rows, cols):
+        '''
+        Sample part of the grid.
 
-        for verts in bm.verts:
-            x, y, _ = self.axes.convert_points_blender_to_graph(verts.co.x, verts.co.y, 0)
-            z = self.function(x, y)
-            verts.co.z = self.axes.convert_points_graph_to_blender(x, y, z)[2]
+        :param rows: slice of grid rows.
+        :param cols: slice of grid columns.
+        :return: (rows, cols, 3) array of blender coordinates.
+        '''
+        b = np.linspace(-1, 1, self.precision + 1)
+        xb, yb = np.meshgrid(b[cols], b[rows])
+        xg, yg, _ = self.axes.convert_points_blender_to_graph(xb, yb, 0)
+        zg = _evaluate(self.function, xg, yg)
+        zb = self.axes.convert_points_graph_to_blender(xg, yg, zg)[2]
+        return np.stack((xb, yb, zb), axis=-1)
+
+    def _tiles(self):
+        '''
+        Generate (grid, normals, rows, cols) for each tile, where rows and cols are the point index ranges of the tile.
+        Tiles include the points on their edges, so neighbouring tiles share a row or column of points. Normals are
+        calculated from a grid that extends one point beyond the tile, so they match across tile edges.
+        '''
+        n_rows, n_cols = self._grid_size()
+        for r0 in range(0, n_rows - 1, self.tile_size):
+            r1 = min(r0 + self.tile_size, n_rows - 1)
+            for c0 in range(0, n_cols - 1, self.tile_size):
+                c1 = min(c0 + self.tile_size, n_cols - 1)
+                hr0, hc0 = max(r0 - 1, 0), max(c0 - 1, 0)
+                halo = self._sample_tile(slice(hr0, min(r1 + 2, n_rows)), slice(hc0, min(c1 + 2, n_cols)))
+                inner = (slice(r0 - hr0, r1 - hr0 + 1), slice(c0 - hc0, c1 - hc0 + 1))
+                yield halo[inner], self._grid_normals(halo)[inner], range(r0, r1 + 1), range(c0, c1 + 1)
+
+    def _plot_tiled(self):
+        n_rows, n_cols = self._grid_size()
+        base = n_rows * n_cols
+        if self.join_tiles:
+            vertices = np.zeros((base, 3), dtype=np.float32)
+            normals = np.zeros((base, 3), dtype=np.float32)
+            faces = []
+            # New vertices along the clipped edges get ids after the grid, so neighbouring tiles share them
+            clipper = _BoxClipper(base)
+        else:
+            tile_objects = []
+        contour_vertices = []
+        contour_edges = []
+        contour_count = 0
+
+        for grid, tile_normals, rows, cols in self._tiles():
+            with np.errstate(invalid='ignore'):
+                if self.clip_to_axes and np.any(np.all(grid > 1, axis=(0, 1)) | np.all(grid < -1, axis=(0, 1))):
+                    continue
+
+            if self.contour_levels:
+                cv, ce = self._contour_geometry(grid)
+                contour_vertices.append(cv)
+                contour_edges.append(ce + contour_count)
+                contour_count += len(cv)
+
+            if self.join_tiles:
+                ids = np.array(rows)[:, None] * n_cols + np.array(cols)[None, :]
+                vertices[ids.ravel()] = grid.reshape(-1, 3)
+                normals[ids.ravel()] = tile_normals.reshape(-1, 3)
+                faces.extend(self._tile_faces(grid, tile_normals, ids, clipper))
+            else:
+                tile_clipper = _BoxClipper(grid.shape[0] * grid.shape[1])
+                ids = np.arange(grid.shape[0] * grid.shape[1]).reshape(grid.shape[:2])
+                tile_faces = self._tile_faces(grid, tile_normals, ids, tile_clipper)
+                tile_objects.append(self._create_tile_object("surface_tile", grid.reshape(-1, 3),
+                                                             tile_normals.reshape(-1, 3), tile_clipper, tile_faces))
+
+        if self.join_tiles and faces:
+            self._apply_fill(self._create_tile_object("surface_plot", vertices, normals, clipper, faces))
+        if not self.join_tiles:
+            # Fill the tiles together, so they share one material and value range
+            self._fill_objects(tile_objects)
+
+        if contour_edges:
+            self._create_contour_object(np.concatenate(contour_vertices), np.concatenate(contour_edges))
+
+    def _tile_faces(self, grid, normals, ids, clipper):
+        '''
+        Faces of one tile, as a list of arrays of vertex ids. If the plot is clipped, cells are clipped to the axes box
+        analytically, so no boolean is needed.
+        '''
+        quads = ids.ravel()[utils.grid_faces(*ids.shape)]
+        if not self.clip_to_axes:
+            return [quads]
+        return clipper.clip_tile(grid, normals, ids, quads)
+
+    def _create_tile_object(self, name, vertices, normals, clipper, faces):
+        '''
+        Create a mesh from grid vertices plus the vertices added by clipping, leaving out vertices that no face uses.
+        '''
+        used = np.zeros(len(vertices) + len(clipper.positions), dtype=bool)
+        for f in faces:
+            used[f.ravel()] = True
+        remap = (np.cumsum(used) - 1).astype(np.int32)
+        grid_used = used[:len(vertices)]
+        all_vertices = np.concatenate((vertices[grid_used], np.array(clipper.positions, dtype=np.float32).reshape(-1, 3)))
+        all_normals = np.concatenate((normals[grid_used], np.array(clipper.normals, dtype=np.float32).reshape(-1, 3)))
+        obj = utils.create_mesh_object(name, all_vertices, [remap[f] for f in _group_faces(faces)])
+        if self.smooth_shading:
+            utils.set_custom_normals(obj.data, all_normals)
+        return obj
+
+    def _estimate_precision(self):
+        self.precision = 16
+        return self._projected_grid_precision(self._sample_grid())
+
+    def _estimated_grid_size(self):
+        '''
+        Number of (rows, cols) in the sample grid, without sampling anything.
+        '''
+        return self.precision + 1, self.precision + 1
+
+    def _cost(self):
+        rows, cols = self._estimated_grid_size()
+        if self.tile_size:
+            tile_rows = math.ceil((rows - 1) / self.tile_size)
+            tile_cols = math.ceil((cols - 1) / self.tile_size)
+            if self.join_tiles:
+                cost = self._surface_cost(rows * cols)
+            else:
+                # Tiles share no vertices, so the points along tile edges are duplicated
+                cost = self._surface_cost((rows - 1 + tile_rows) * (cols - 1 + tile_cols), tile_rows * tile_cols)
+            # Tiled surfaces are clipped without booleans
+            crop = self._crop_cost(1 if self.join_tiles else tile_rows * tile_cols)
+            cost = {key: cost[key] - crop[key] for key in COST_KEYS}
+        else:
+            cost = self._surface_cost(rows * cols)
+        if self.show_lines:
+            divs = self.axes._div_values()
+            cost = _add_costs(cost, self._segment_cost((len(divs[0]) + len(divs[1])) * self._line_segments()))
+        return cost
+
+    def _gradient_magnitude(self, x, y, z):
+        hx = self.axes.extent[0] * 1e-4
+        hy = self.axes.extent[1] * 1e-4
+        dx = (_evaluate(self.function, x + hx, y) - _evaluate(self.function, x - hx, y)) / (2 * hx)
+        dy = (_evaluate(self.function, x, y + hy) - _evaluate(self.function, x, y - hy)) / (2 * hy)
+        return np.hypot(dx, dy)
+
+    def plot(self):
+        self._check_plot_budget()
+        self._resolve_precision()
+        if self.tile_size:
+            self._plot_tiled()
+            if self.show_lines:
+                self.draw_lines()
+            return
+
+        grid = self._sample_grid()
+        obj = self._create_grid_object("surface_plot", grid)
 
-        bmesh.update_edit_mesh(mesh)
+        self._apply_fill(obj)
 
-        self.apply_colormap(self.colormap)
+        if self.contour_levels:
+            self._draw_contours(grid)
 
         if self.show_lines:
             self.draw_lines()
@@ -460,6 +1234,248 @@ class Plot3dZofXY(BasePlot):
             self.crop_plot(obj)
 
 
+def _group_faces(faces):
+    '''
+    Combine a list of face arrays into one array per face size.
+    '''
+    by_size = {}
+    for f in faces:
+        if len(f):
+            by_size.setdefault(f.shape[1], []).append(f)
+    return [np.concatenate(group) for group in by_size.values()]
+
+
+class _BoxClipper:
+    '''
+    Clip the cells of surface grids to the axes box, -1 <= x, y, z <= 1. Cells completely inside are kept as quads and
+    cells completely outside one of the planes are dropped. Cells that cross the box are split into two triangles, which
+    are clipped against each plane, giving polygons of 3 to 9 vertices. A new vertex is made where a clip plane crosses
+    an edge, with an interpolated normal. New vertices are keyed by the edge and plane, so cells (and tiles) sharing an
+    edge share the new vertex.
+    '''
+
+    def __init__(self, first_id):
+        self.next_id = first_id
+        self.edge_vertices = {}
+        self.positions = []
+        self.normals = []
+
+    def clip_tile(self, grid, normals, ids, quads):
+        '''
+        Args:
+            grid: (rows, cols, 3) grid of blender coordinates.
+            normals: (rows, cols, 3) vertex normals.
+            ids: (rows, cols) vertex ids of the grid points.
+            quads: (m, 4) quad faces of the grid, as ids, in the order of utils.grid_faces.
+
+        Returns:
+            List of face arrays
+        '''
+        corners = np.stack((grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1])).reshape(4, -1, 3)
+        with np.errstate(invalid='ignore'):
+            inside = np.all(np.abs(corners) <= 1, axis=(0, 2))
+            outside = np.any(np.all(corners > 1, axis=0) | np.all(corners < -1, axis=0), axis=1)
+        faces = [quads[inside]]
+
+        lookup = {int(i): (p, n) for i, p, n in zip(ids.ravel(), grid.reshape(-1, 3), normals.reshape(-1, 3))}
+        polygons = []
+        for quad in quads[~inside & ~outside]:
+            for triangle in ((quad[0], quad[1], quad[2]), (quad[0], quad[2], quad[3])):
+                polygon = [(int(i),) + lookup[int(i)] for i in triangle]
+                for axis in range(3):
+                    polygon = self._clip(self._clip(polygon, axis, 1, False), axis, -1, True)
+                if len(polygon) >= 3:
+                    polygons.append([v[0] for v in polygon])
+        for size in range(3, 10):
+            faces.append(np.array([p for p in polygons if len(p) == size], dtype=np.int64).reshape(-1, size))
+        return faces
+
+    def _clip(self, polygon, axis, level, keep_above):
+        def keep(vertex):
+            return vertex[1][axis] >= level if keep_above else vertex[1][axis] <= level
+
+        result = []
+        for i, current in enumerate(polygon):
+            following = polygon[(i + 1) % len(polygon)]
+            if keep(current):
+                result.append(current)
+            # A vertex lying exactly on the plane is kept as it is, rather than adding a copy of it
+            if (keep(current) != keep(following) and np.isfinite(current[1][axis])
+                    and np.isfinite(following[1][axis]) and current[1][axis] != level
+                    and following[1][axis] != level):
+                result.append(self._edge_vertex(current, following, axis, level))
+        return result
+
+    def _edge_vertex(self, a, b, axis, level):
+        key = (min(a[0], b[0]), max(a[0], b[0]), axis, level)
+        if key not in self.edge_vertices:
+            if a[0] > b[0]:
+                a, b = b, a
+            t = (level - a[1][axis]) / (b[1][axis] - a[1][axis])
+            position = a[1] + t * (b[1] - a[1])
+            position[axis] = level
+            normal = a[2] + t * (b[2] - a[2])
+            length = np.linalg.norm(normal)
+            normal = normal / length if length > 1e-12 else np.zeros(3)
+            self.edge_vertices[key] = (self.next_id, position, normal)
+            self.positions.append(position)
+            self.normals.append(normal)
+            self.next_id += 1
+        return self.edge_vertices[key]
+
+
+def _downsample(data, points, method):
+    '''
+    Reduce a 2D array to at most points x points samples. The data is read in strips of rows, so a memory mapped array
+    is never loaded into memory all at once.
+
+    Args:
+        data: 2D array, which may be a numpy memmap.
+        points: maximum number of samples in each direction.
+        method: "mean" averages each block of samples, "stride" picks evenly spaced samples.
+
+    Returns:
+        (values, row_positions, col_positions), positions are fractional sample indices into data
+    '''
+    n_rows, n_cols = data.shape
+    if method == "stride":
+        rows = np.linspace(0, n_rows - 1, min(points, n_rows)).round().astype(np.int64)
+        cols = np.linspace(0, n_cols - 1, min(points, n_cols)).round().astype(np.int64)
+        values = np.empty((len(rows), len(cols)))
+        strip = max(1, (1 << 22) // n_cols)
+        for r0 in range(0, len(rows), strip):
+            values[r0:r0 + strip] = np.asarray(data[rows[r0:r0 + strip]])[:, cols]
+        return values, rows.astype(np.float64), cols.astype(np.float64)
+
+    if method != "mean":
+        raise ValueError(f"Unknown downsample method {method}")
+
+    row_edges = np.linspace(0, n_rows, min(points, n_rows) + 1).round().astype(np.int64)
+    col_edges = np.linspace(0, n_cols, min(points, n_cols) + 1).round().astype(np.int64)
+    col_counts = np.diff(col_edges)
+    values = np.empty((len(row_edges) - 1, len(col_edges) - 1))
+    for r in range(len(row_edges) - 1):
+        block = np.asarray(data[row_edges[r]:row_edges[r + 1]], dtype=np.float64)
+        values[r] = np.add.reduceat(block.sum(axis=0), col_edges[:-1]) / (len(block) * col_counts)
+    return values, (row_edges[:-1] + row_edges[1:] - 1) / 2, (col_edges[:-1] + col_edges[1:] - 1) / 2
+
+
+class Plot3dZofXYData(Plot3dZofXY):
+
+    def __init__(self, axes):
+        super().__init__(axes)
+        self.precision = 200
+        self.data = np.zeros((2, 2))
+        self.x_range = (0, 1)
+        self.y_range = (0, 1)
+        self.method = "mean"
+        self.values = None
+        self.x_positions = None
+        self.y_positions = None
+        self.function = self._interpolate
+
+    def of_data(self, data, x_range=None, y_range=None, precision=200, method="mean"):
+        '''
+        Plot a surface from a 2D array of z values. Row i of the data holds the values for the i-th y position, column j
+        the values for the j-th x position.
+
+        Large arrays are reduced to at most (precision+1) samples in each direction when the plot is drawn. The data is
+        read a strip at a time, so a memory mapped array is never fully loaded.
+
+        Args:
+            data: 2D array of z values, or the path of a .npy file which will be memory mapped.
+            x_range: (start, end) x values of the first and last columns. Defaults to the x range of the axes.
+            y_range: (start, end) y values of the first and last rows. Defaults to the y range of the axes.
+            precision: number of grid cells to plot in each direction. Defaults to 200. If "auto", the precision is
+                chosen when the plot is drawn so that facets are about facet_pixels in size.
+            method: "mean" to average blocks of samples, "stride" to pick evenly spaced samples.
+
+        Returns:
+            self
+        '''
+        if isinstance(data, (str, os.PathLike)):
+            data = np.load(data, mmap_mode="r")
+        if x_range is None:
+            x_range = (self.axes.start[0], self.axes.start[0] + self.axes.extent[0])
+        if y_range is None:
+            y_range = (self.axes.start[1], self.axes.start[1] + self.axes.extent[1])
+
+        self.data = data
+        self.x_range = x_range
+        self.y_range = y_range
+        self.method = method
+        self.values = None
+        self._set_precision(precision)
+        return self
+
+    def of_raw_file(self, path, shape, x_range=None, y_range=None, dtype=np.float32, offset=0, precision=200,
+                    method="mean"):
+        '''
+        Plot a surface from a raw binary file of z values, stored row by row with no header. The file is memory mapped.
+
+        Args:
+            path: path of the file.
+            shape: (rows, cols) shape of the data.
+            dtype: data type of the values. Defaults to float32.
+            offset: byte offset of the first value in the file.
+            Other arguments are the same as of_data.
+
+        Returns:
+            self
+        '''
+        data = np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape), offset=offset)
+        return self.of_data(data, x_range, y_range, precision, method)
+
+    def _reduce(self, points, method):
+        '''
+        Reduce the data to at most points samples in each direction.
+        '''
+        self.values, rows, cols = _downsample(self.data, points, method)
+        n_rows, n_cols = self.data.shape
+        self.x_positions = self.x_range[0] + cols * (self.x_range[1] - self.x_range[0]) / max(n_cols - 1, 1)
+        self.y_positions = self.y_range[0] + rows * (self.y_range[1] - self.y_range[0]) / max(n_rows - 1, 1)
+
+    def _interpolate(self, x, y):
+        '''
+        Bilinear interpolation of the reduced data, used for drawing grid lines.
+        '''
+        fx = np.interp(x, self.x_positions, np.arange(len(self.x_positions)))
+        fy = np.interp(y, self.y_positions, np.arange(len(self.y_positions)))
+        ix = np.clip(np.floor(fx).astype(np.int64), 0, max(len(self.x_positions) - 2, 0))
+        iy = np.clip(np.floor(fy).astype(np.int64), 0, max(len(self.y_positions) - 2, 0))
+        ix1 = np.minimum(ix + 1, len(self.x_positions) - 1)
+        iy1 = np.minimum(iy + 1, len(self.y_positions) - 1)
+        tx = fx - ix
+        ty = fy - iy
+        v = self.values
+        return ((v[iy, ix] * (1 - tx) + v[iy, ix1] * tx) * (1 - ty)
+                + (v[iy1, ix] * (1 - tx) + v[iy1, ix1] * tx) * ty)
+
+    def _reduced_grid(self):
+        xg, yg = np.meshgrid(self.x_positions, self.y_positions)
+        return np.stack(self.axes.convert_points_graph_to_blender(xg, yg, self.values), axis=-1)
+
+    def _sample_grid(self):
+        self._reduce(self.precision + 1, self.method)
+        return self._reduced_grid()
+
+    def _grid_size(self):
+        # Tiles are cut from the reduced grid, which may be smaller than precision+1 for small data
+        self._tile_source = self._sample_grid()
+        return self._tile_source.shape[:2]
+
+    def _sample_tile(self, rows, cols):
+        return self._tile_source[rows, cols]
+
+    def _estimated_grid_size(self):
+        return tuple(min(self.precision + 1, n) for n in self.data.shape)
+
+    def _estimate_precision(self):
+        # A strided sample only reads 17 rows of the data
+        self._reduce(17, "stride")
+        return self._projected_grid_precision(self._reduced_grid())
+
+
 class Plot3dXYZofUV(BasePlot):
 
     def __init__(self, axes):
@@ -471,6 +1487,8 @@ class Plot3dXYZofUV(BasePlot):
         self.v_extent = (0, 1)
         self.u_divs = 10
         self.v_divs = 10
+        self.periodic_u = False
+        self.periodic_v = False
 
     def stroke(self, color, line_width=0.01, u_divs=10, v_divs=10):
         self.line_color = color
@@ -480,40 +1498,50 @@ class Plot3dXYZofUV(BasePlot):
         self.v_divs = v_divs
         return self
 
-    def of_function(self, function_x, function_y, function_z, u_extent = (0, 1), v_extent = (0, 1), precision=20):
+    def of_function(self, function_x, function_y, function_z, u_extent = (0, 1), v_extent = (0, 1), precision=20,
+                    periodic_u=False, periodic_v=False):
         '''
         Plot a function z = fn(x, y)
 
         Args:
-            function: the function to plot.
-            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots
+            function_x, function_y, function_z: the functions to plot, each either a function of u and v or an
+                expression string in u and v (see expression.py).
+            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots. If
+                "auto", the precision is chosen when the plot is drawn so that facets are about facet_pixels in size.
+            periodic_u: True if the surface wraps round in u, so the end of u_extent meets the start (eg a torus or
+                the angle of a helicoid). The seam is sampled once and the faces are joined across it.
+            periodic_v: True if the surface wraps round in v.
 
         Returns:
             self
         '''
 
-        self.function_x = function_x
-        self.function_y = function_y
-        self.function_z = function_z
-        self.precision = precision
+        self.function_x = as_function(function_x, ("u", "v"))
+        self.function_y = as_function(function_y, ("u", "v"))
+        self.function_z = as_function(function_z, ("u", "v"))
+        self._set_precision(precision)
         self.u_extent = u_extent
         self.v_extent = v_extent
+        self.periodic_u = periodic_u
+        self.periodic_v = periodic_v
         return self
 
     def draw_lines(self):
+        segments = self._line_segments()
         lines = self.u_divs
-        step =  (self.u_extent[1] - self.u_extent[0])/(lines - 1)
+        # On a periodic axis the last line would be drawn on top of the first
+        step =  (self.u_extent[1] - self.u_extent[0])/(lines if self.periodic_u else lines - 1)
         steps = [self.u_extent[0] + i*step for i in range(lines)]
         print(steps)
         for u in steps:
-            for i in range(self.precision):
-                v0 = self.v_extent[0] + i * (self.v_extent[1] - self.v_extent[0])/self.precision
+            for i in range(segments):
+                v0 = self.v_extent[0] + i * (self.v_extent[1] - self.v_extent[0])/segments
                 x0g = self.function_x(u, v0)
                 y0g = self.function_y(u, v0)
                 z0g = self.function_z(u, v0)
                 x0, y0, z0 = self.axes.convert_points_graph_to_blender(x0g, y0g, z0g)
 
-                v1 = self.v_extent[0] + (i +1) * (self.v_extent[1] - self.v_extent[0])/self.precision
+                v1 = self.v_extent[0] + (i +1) * (self.v_extent[1] - self.v_extent[0])/segments
                 x1g = self.function_x(u, v1)
                 y1g = self.function_y(u, v1)
                 z1g = self.function_z(u, v1)
@@ -524,18 +1552,18 @@ class Plot3dXYZofUV(BasePlot):
                     self.crop_plot(bpy.context.active_object)
 
         lines = self.v_divs
-        step =  (self.v_extent[1] - self.v_extent[0])/(lines - 1)
+        step =  (self.v_extent[1] - self.v_extent[0])/(lines if self.periodic_v else lines - 1)
         steps = [self.v_extent[0] + i*step for i in range(lines)]
         print(steps)
         for v in steps:
-            for i in range(self.precision):
-                u0 = self.u_extent[0] + i * (self.u_extent[1] - self.u_extent[0])/self.precision
+            for i in range(segments):
+                u0 = self.u_extent[0] + i * (self.u_extent[1] - self.u_extent[0])/segments
                 x0g = self.function_x(u0, v)
                 y0g = self.function_y(u0, v)
                 z0g = self.function_z(u0, v)
                 x0, y0, z0 = self.axes.convert_points_graph_to_blender(x0g, y0g, z0g)
 
-                u1 = self.u_extent[0] + i * (self.u_extent[1] - self.u_extent[0])/self.precision
+                u1 = self.u_extent[0] + i * (self.u_extent[1] - self.u_extent[0])/segments
                 x1g = self.function_x(u1, v)
                 y1g = self.function_y(u1, v)
                 z1g = self.function_z(u1, v)
@@ -545,38 +1573,53 @@ class Plot3dXYZofUV(BasePlot):
                 if self.clip_to_axes:
                     self.crop_plot(bpy.context.active_object)
 
-    def plot(self):
-        bpy.ops.mesh.primitive_grid_add(x_subdivisions=self.precision, y_subdivisions=self.precision,
-                                        location=(0, 0, 0))
-
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        obj = bpy.context.active_object
-        mesh = obj.data
+    def _sample_grid(self):
+        '''
+        Sample the functions over a (precision+1) x (precision+1) grid of u, v values. A periodic parameter only has
+        precision values, as the end of the range is the same as the start.
 
-        bm = bmesh.from_edit_mesh(mesh)
+        :return: (rows, cols, 3) array of blender coordinates, rows follow v and columns follow u.
+        '''
+        t = np.linspace(0, 1, self.precision + 1)
+        tu = t[:-1] if self.periodic_u else t
+        tv = t[:-1] if self.periodic_v else t
+        u, v = np.meshgrid(self.u_extent[0] + tu*(self.u_extent[1] - self.u_extent[0]),
+                           self.v_extent[0] + tv*(self.v_extent[1] - self.v_extent[0]))
+        x = _evaluate(self.function_x, u, v)
+        y = _evaluate(self.function_y, u, v)
+        z = _evaluate(self.function_z, u, v)
+        return np.stack(self.axes.convert_points_graph_to_blender(x, y, z), axis=-1)
+
+    def _estimate_precision(self):
+        self.precision = 16
+        return self._projected_grid_precision(self._sample_grid())
+
+    def _cost(self):
+        rows = self.precision + (0 if self.periodic_v else 1)
+        cols = self.precision + (0 if self.periodic_u else 1)
+        cost = self._surface_cost(rows * cols)
+        if self.show_lines:
+            cost = _add_costs(cost, self._segment_cost((self.u_divs + self.v_divs) * self._line_segments()))
+        return cost
 
-        for verts in bm.verts:
-            vert_u = (verts.co.x + 1)/2
-            vert_v = (verts.co.y + 1)/2
-            u = self.u_extent[0] + vert_u*(self.u_extent[1] - self.u_extent[0])
-            v = self.v_extent[0] + vert_v*(self.v_extent[1] - self.v_extent[0])
-            x = self.function_x(u, v)
-            y = self.function_y(u, v)
-            z = self.function_z(u, v)
-            verts.co.x, verts.co.y, verts.co.z = self.axes.convert_points_graph_to_blender(x, y, z)
+    def plot(self):
+        self._check_plot_budget()
+        self._resolve_precision()
+        grid = self._sample_grid()
+        obj = self._create_grid_object("surface_plot", grid, wrap_rows=self.periodic_v, wrap_cols=self.periodic_u)
 
-        bmesh.update_edit_mesh(mesh)
+        self._apply_fill(obj)
 
-        self.apply_colormap(self.colormap)
+        if self.contour_levels:
+            self._draw_contours(_wrap_grid(grid, self.periodic_v, self.periodic_u))
 
         if self.show_lines:
             self.draw_lines()
 
         if self.clip_to_axes:
             self.crop_plot(obj)
-        
-        
+
+
 class Plot2dXYZofT(BasePlot):
 
     def __init__(self, axes):
@@ -599,36 +1642,617 @@ class Plot2dXYZofT(BasePlot):
         Plot a function z = fn(x, y)
 
         Args:
-            function: the function to plot.
-            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots
+            function_x, function_y, function_z: the functions to plot, each either a function of t or an expression
+                string in t (see expression.py).
+            precision: number of points to plot. Defaults to 20. This can be increased if needed for hi res plots. If
+                "auto", the precision is chosen when the plot is drawn so that segments are about facet_pixels long.
 
         Returns:
             self
         '''
 
-        self.function_x = function_x
-        self.function_y = function_y
-        self.function_z = function_z
-        self.precision = precision
+        self.function_x = as_function(function_x, ("t",))
+        self.function_y = as_function(function_y, ("t",))
+        self.function_z = as_function(function_z, ("t",))
+        self._set_precision(precision)
         self.t_extent = t_extent
         return self
 
 
-    def plot(self):
-        delta = (self.t_extent[1] - self.t_extent[0])/self.precision 
-        for i in range(self.precision):
-            t = self.t_extent[0] + i*delta
+    def _sample_points(self):
+        '''
+        Sample the curve at precision+1 equally spaced t values.
 
-            x0 = self.function_x(t)
-            y0 = self.function_y(t)
-            z0 = self.function_z(t)
-            x0g, y0g, z0g = self.axes.convert_points_graph_to_blender(x0, y0, z0)
+        :return: (precision+1, 3) array of blender coordinates.
+        '''
+        t = np.linspace(self.t_extent[0], self.t_extent[1], self.precision + 1)
+        x = _evaluate(self.function_x, t)
+        y = _evaluate(self.function_y, t)
+        z = _evaluate(self.function_z, t)
+        return np.stack(self.axes.convert_points_graph_to_blender(x, y, z), axis=-1)
+
+    def _estimate_precision(self):
+        self.precision = 64
+        points = self.axes.blender_to_world(self._sample_points())
+        pixels = camera.project_to_pixels(bpy.data.objects.get("Camera"), points)
+        return self._precision_for_length(np.linalg.norm(np.diff(pixels, axis=0), axis=-1).sum(), max_precision=5000)
 
-            x1 = self.function_x(t + delta)
-            y1 = self.function_y(t + delta)
-            z1 = self.function_z(t + delta)
-            x1g, y1g, z1g = self.axes.convert_points_graph_to_blender(x1, y1, z1)
+    def _cost(self):
+        return self._segment_cost(self.precision)
 
-            self.axes.cylinder_between(x0g, y0g, z0g, x1g, y1g, z1g, self.line_radius, self.line_color)
+    def plot(self):
+        self._check_plot_budget()
+        self._resolve_precision()
+        points = self._sample_points()
+        for p0, p1 in zip(points[:-1], points[1:]):
+            self.axes.cylinder_between(*p0, *p1, self.line_radius, self.line_color)
             if self.clip_to_axes:
                 self.crop_plot(bpy.context.active_object)
+
+
+class Plot2dXYZStream(BasePlot):
+
+    def __init__(self, axes):
+        super().__init__(axes)
+        self.show_lines = True
+        self.line_radius = 0.02
+        self.chunks = ()
+        self.initial_capacity = 1024
+        self.render_frames = False
+
+        # Graph coordinates of the points so far, in a buffer that grows by doubling
+        self.points = np.empty((0, 3))
+        self.count = 0
+        self.curve_object = None
+        self.spline = None
+
+    def stroke(self, color, line_width=0.02):
+        BasePlot.stroke(self, color, line_width)
+        return self
+
+    def of_stream(self, chunks, initial_capacity=1024):
+        '''
+        Plot a curve from a stream of points, for example from a running simulation.
+
+        Args:
+            chunks: iterable or generator producing chunks of points. Each chunk is an (n, 3) array (or sequence) of
+                (x, y, z) graph coordinates, which is appended to the end of the curve.
+            initial_capacity: number of points to allocate initially. Capacity doubles when it is used up, so the cost
+                of each append is proportional to the chunk size rather than the length of the curve.
+
+        Returns:
+            self
+        '''
+        self.chunks = chunks
+        self.initial_capacity = initial_capacity
+        return self
+
+    def with_frame_rendering(self, render_frames=True):
+        '''
+        Render a frame after each chunk. If this is set, plot only creates the (empty) curve, and render_stream must be
+        called after make_blender_image to consume the stream and render the frames.
+
+        Returns:
+            self
+        '''
+        self.render_frames = render_frames
+        return self
+
+    def _create_curve(self):
+        curve = bpy.data.curves.new("stream_curve", type='CURVE')
+        curve.dimensions = '3D'
+        curve.bevel_depth = self.line_radius
+        curve.bevel_resolution = 4
+        self.spline = curve.splines.new('POLY')
+        self.spline.points[0].radius = 0
+        self.curve_object = bpy.data.objects.new("stream_curve", curve)
+        bpy.context.collection.objects.link(self.curve_object)
+        mat = bpy.data.materials.new("col")
+        mat.diffuse_color = self.line_color
+        self.curve_object.active_material = mat
+
+    def _reserve(self, count):
+        '''
+        Make sure there is room for count more points. Unused spline points have zero radius, so they are not visible.
+        '''
+        capacity = len(self.points)
+        if self.count + count <= capacity:
+            return
+        new_capacity = max(2 * capacity, self.count + count, self.initial_capacity)
+        self.points = np.resize(self.points, (new_capacity, 3))
+        spline_points = self.spline.points
+        old_size = len(spline_points)
+        spline_points.add(new_capacity + 1 - old_size)
+        for i in range(old_size, new_capacity + 1):
+            spline_points[i].radius = 0
+
+    def append(self, chunk):
+        '''
+        Append a chunk of points to the curve. Only the new points (and one spare point after them) are updated.
+
+        Args:
+            chunk: (n, 3) array or sequence of (x, y, z) graph coordinates.
+        '''
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1, 3)
+        if len(chunk) == 0:
+            return
+        if self.curve_object is None:
+            self._create_curve()
+        self._reserve(len(chunk))
+        self.points[self.count:self.count + len(chunk)] = chunk
+
+        blender = np.stack(self.axes.convert_points_graph_to_blender(chunk[:, 0], chunk[:, 1], chunk[:, 2]), axis=-1)
+        visible = np.all(np.abs(blender) <= 1, axis=-1) if self.clip_to_axes else np.ones(len(blender), dtype=bool)
+        spline_points = self.spline.points
+        for i, (p, v) in enumerate(zip(blender, visible)):
+            point = spline_points[self.count + i]
+            point.co = (p[0], p[1], p[2], 1)
+            point.radius = 1 if v else 0
+        self.count += len(chunk)
+
+        # The next spare point sits on the last point, so the curve ends cleanly rather than tapering away
+        spline_points[self.count].co = (blender[-1][0], blender[-1][1], blender[-1][2], 1)
+
+    def _cost(self):
+        # The curve grows as the stream is consumed, so only the initial allocation is counted
+        return _cost(objects=1, vertices=self.initial_capacity + 1, materials=1)
+
+    def plot(self):
+        self._check_plot_budget()
+        self._create_curve()
+        if not self.render_frames:
+            for chunk in self.chunks:
+                self.append(chunk)
+
+    def render_stream(self):
+        '''
+        Consume the stream, rendering one numbered frame after each chunk. Call this after make_blender_image.
+
+        Returns:
+            List of the rendered image paths
+        '''
+        scene = bpy.context.scene
+        paths = []
+        for frame, chunk in enumerate(self.chunks, 1):
+            self.append(chunk)
+            scene.frame_current = frame
+            paths.append(make_image.render_still())
+        return paths
+
+
+def _sample_volume(function, axes, precision, chunk_size):
+    '''
+    Sample a function f(x, y, z) on a (precision+1)^3 grid that is evenly spaced in blender coordinates, so log and
+    symlog axes are sampled evenly as drawn. The function is evaluated chunk_size x slices at a time.
+
+    Returns:
+        (n, n, n) float32 array indexed [x, y, z], where n is precision+1
+    '''
+    n = precision + 1
+    coords = [axes._to_graph(i, np.linspace(axes.axis_start[i], axes.axis_end[i], n)) for i in range(3)]
+    values = np.empty((n, n, n), dtype=np.float32)
+    for i0 in range(0, n, chunk_size):
+        i1 = min(i0 + chunk_size, n)
+        x, y, z = np.meshgrid(coords[0][i0:i1], coords[1], coords[2], indexing='ij')
+        values[i0:i1] = _evaluate(function, x, y, z)
+    return values
+
+
+class Plot3dImplicit(BasePlot):
+
+    def __init__(self, axes):
+        super().__init__(axes)
+        self.function = lambda x, y, z: 0
+        self.level = 0
+        self.precision = 64
+        self.chunk_size = 16
+
+    def of_function(self, function, level=0, precision=64, chunk_size=16):
+        '''
+        Plot the implicit surface fn(x, y, z) = level
+
+        The function is sampled on a (precision+1)^3 grid covering the axes. It is called with numpy arrays holding
+        chunk_size slices of the grid at a time, so functions written with numpy operations are evaluated in bulk and
+        memory use stays bounded at high precision.
+
+        Args:
+            function: the function to plot, or an expression string in x, y and z (see expression.py).
+            level: the value of the level set. Defaults to 0.
+            precision: number of grid cells in each direction. Defaults to 64. If "auto", the precision is chosen when
+                the plot is drawn so that grid cells are about facet_pixels in size, up to a maximum of 256.
+            chunk_size: number of grid slices evaluated and processed at a time. Defaults to 16.
+
+        Returns:
+            self
+        '''
+        self.function = as_function(function, ("x", "y", "z"))
+        self.level = level
+        self._set_precision(precision)
+        self.chunk_size = chunk_size
+        return self
+
+    def _sample(self):
+        return _sample_volume(self.function, self.axes, self.precision, self.chunk_size)
+
+    def _estimate_precision(self):
+        return min(256, super()._estimate_precision())
+
+    def _gradient_magnitude(self, x, y, z):
+        h = [e * 1e-4 for e in self.axes.extent]
+        dx = (_evaluate(self.function, x + h[0], y, z) - _evaluate(self.function, x - h[0], y, z)) / (2 * h[0])
+        dy = (_evaluate(self.function, x, y + h[1], z) - _evaluate(self.function, x, y - h[1], z)) / (2 * h[1])
+        dz = (_evaluate(self.function, x, y, z + h[2]) - _evaluate(self.function, x, y, z - h[2])) / (2 * h[2])
+        return np.sqrt(dx ** 2 + dy ** 2 + dz ** 2)
+
+    def _cost(self):
+        return self._surface_cost(0)
+
+    def plot(self):
+        self._check_plot_budget()
+        self._resolve_precision()
+        values = self._sample()
+        vertices, faces, normals = marching_cubes(values, self.level, self.chunk_size)
+
+        # The grid is evenly spaced in blender coordinates, so grid index coordinates map linearly to blender
+        # coordinates, whatever the axis scales. Normals transform with the inverse of the (diagonal) scaling.
+        scale = (np.array(self.axes.axis_end, dtype=np.float64) - np.array(self.axes.axis_start)) / self.precision
+        blender = np.array(self.axes.axis_start, dtype=np.float64) + vertices * scale
+        obj = utils.create_mesh_object("implicit_plot", blender, faces)
+        if self.smooth_shading:
+            # Zero normals (where the gradient vanishes) stay zero, so Blender uses its own normal there
+            normals = normals / scale
+            lengths = np.linalg.norm(normals, axis=-1, keepdims=True)
+            normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 1e-12)
+            utils.set_custom_normals(obj.data, normals)
+
+        self._apply_fill(obj)
+
+        if self.clip_to_axes:
+            self.crop_plot(obj)
+
+
+class Plot3dVolume(BasePlot):
+
+    def __init__(self, axes):
+        super().__init__(axes)
+        self.function = lambda x, y, z: 0
+        self.precision = 64
+        self.chunk_size = 16
+        self.density = 4
+        self.vdb_dir = None
+        self.colormap = colormaps.ViridianMap(0, 1)
+
+    def of_function(self, function, precision=64, chunk_size=16, density=4, vdb_dir=None):
+        '''
+        Plot a scalar field fn(x, y, z), such as a density, as a coloured volume filling the axes box.
+
+        The function is sampled on a (precision+1)^3 grid, chunk_size slices at a time. If OpenVDB is available the
+        samples are stored as a Blender volume object, otherwise as a point cloud read by a point density texture on a
+        cube the size of the axes. Either way the values are coloured by the fill colormap through an emission and
+        absorption volume shader, see utils.create_volume_colormap_material.
+
+        Args:
+            function: the function to plot, or an expression string in x, y and z (see expression.py).
+            precision: number of grid cells in each direction. Defaults to 64. If "auto", the precision is chosen when
+                the plot is drawn so that grid cells are about facet_pixels in size, up to a maximum of 200.
+            chunk_size: number of grid slices evaluated at a time. Defaults to 16.
+            density: density and emission strength of the top of the value range. Defaults to 4.
+            vdb_dir: directory for the .vdb file. Defaults to the system temporary directory. The file name is a hash
+                of the samples, so an unchanged plot reuses the same file.
+
+        Returns:
+            self
+        '''
+        self.function = as_function(function, ("x", "y", "z"))
+        self._set_precision(precision)
+        self.chunk_size = chunk_size
+        self.density = density
+        self.vdb_dir = vdb_dir
+        return self
+
+    def _sample(self):
+        return _sample_volume(self.function, self.axes, self.precision, self.chunk_size)
+
+    def _estimate_precision(self):
+        return min(200, super()._estimate_precision())
+
+    def _cost(self):
+        if openvdb is not None:
+            return _cost(objects=1, materials=1)
+        return _cost(objects=2, vertices=(self.precision + 1) ** 3, materials=1)
+
+    def _create_vdb_object(self, values):
+        '''
+        Write the samples to a .vdb file and load it as a volume object. The grid is called "value", and its transform
+        maps the voxel indices onto the -1 to 1 axes box.
+        '''
+        directory = self.vdb_dir or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256(values.tobytes()).hexdigest()
+        path = os.path.join(directory, f"genpyblender_volume_{digest}.vdb")
+        if not os.path.exists(path):
+            grid = openvdb.FloatGrid()
+            grid.copyFromArray(values)
+            grid.name = "value"
+            step = 2 / self.precision
+            grid.transform = openvdb.createLinearTransform([[step, 0, 0, 0], [0, step, 0, 0], [0, 0, step, 0],
+                                                            [-1, -1, -1, 1]])
+            openvdb.write(path, grids=[grid])
+
+        volume = bpy.data.volumes.new("volume_plot")
+        volume.filepath = path
+        obj = bpy.data.objects.new("volume_plot", volume)
+        bpy.context.collection.objects.link(obj)
+        obj.data.materials.append(self.material)
+        return obj
+
+    def _create_point_density_object(self, values):
+        '''
+        Store the samples as the vertices of a point cloud, with the values normalised to 0 to 1 as vertex group weights,
+        and read them with a point density texture in the material of a cube covering the axes.
+        '''
+        n = self.precision + 1
+        b = np.linspace(-1, 1, n)
+        x, y, z = np.meshgrid(b, b, b, indexing='ij')
+        points = utils.create_mesh_object("volume_points", np.stack((x, y, z), axis=-1).reshape(-1, 3))
+
+        # Vertex group weights are set one weight at a time, so quantize the weights to 256 levels
+        low, high = float(np.nanmin(values)), float(np.nanmax(values))
+        span = high - low if high > low else 1
+        levels = np.round(np.nan_to_num((values.ravel() - low) / span) * 255).astype(np.int64)
+        group = points.vertex_groups.new(name="plot_value")
+        order = np.argsort(levels, kind='stable')
+        bounds = np.searchsorted(levels[order], np.arange(257))
+        for level in range(256):
+            indices = order[bounds[level]:bounds[level + 1]]
+            if len(indices):
+                group.add(indices.tolist(), level / 255, 'REPLACE')
+
+        nodes = self.material.node_tree.nodes
+        links = self.material.node_tree.links
+        nodes.remove(nodes["plot_attribute"])
+
+        geometry_node = nodes.new(type='ShaderNodeNewGeometry')
+        geometry_node.location = (-400, 0)
+
+        density_node = nodes.new(type='ShaderNodeTexPointDensity')
+        density_node.name = "plot_point_density"
+        density_node.point_source = 'OBJECT'
+        density_node.object = points
+        density_node.space = 'WORLD'
+        density_node.radius = 2 / self.precision
+        density_node.resolution = n
+        density_node.vertex_color_source = 'VERTEX_WEIGHT'
+        density_node.vertex_attribute_name = "plot_value"
+        density_node.location = (-200, 0)
+
+        # Undo the normalisation, so the value range of the material is in function units as for a VDB volume
+        restore_node = nodes.new(type='ShaderNodeMapRange')
+        restore_node.name = "plot_value_range"
+        restore_node.clamp = False
+        restore_node.inputs["To Min"].default_value = low
+        restore_node.inputs["To Max"].default_value = low + span
+        restore_node.location = (0, 0)
+
+        links.new(geometry_node.outputs["Position"], density_node.inputs["Vector"])
+        links.new(density_node.outputs["Color"], restore_node.inputs["Value"])
+        links.new(restore_node.outputs["Result"], nodes["plot_map_range"].inputs["Value"])
+
+        bpy.ops.mesh.primitive_cube_add(size=2, location=(0, 0, 0))
+        obj = bpy.context.active_object
+        obj.name = "volume_plot"
+        obj.data.materials.append(self.material)
+        return obj
+
+    def plot(self):
+        self._check_plot_budget()
+        self._resolve_precision()
+        values = self._sample()
+
+        value_range = self.color_range
+        if value_range is None:
+            value_range = (float(np.nanmin(values)), float(np.nanmax(values)))
+        self.material = utils.create_volume_colormap_material("Volume Material", "value",
+                                                              colormaps.color_stops(self.colormap), value_range,
+                                                              self.density)
+        if openvdb is not None:
+            return self._create_vdb_object(values)
+        return self._create_point_density_object(values)
+
+
+def _create_bar_node_group(material):
+    '''
+    Geometry nodes group that places one instance of a unit cube, with its base at the origin, on every point. Each
+    instance is scaled by the "bar_scale" point attribute. Point attributes are copied to the instances, so the material
+    can read them with an INSTANCER attribute node.
+    '''
+    group = bpy.data.node_groups.new("plot_bars", 'GeometryNodeTree')
+    if hasattr(group, "interface"):
+        group.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        group.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    else:
+        group.inputs.new('NodeSocketGeometry', "Geometry")
+        group.outputs.new('NodeSocketGeometry', "Geometry")
+    nodes = group.nodes
+    links = group.links
+
+    input_node = nodes.new(type='NodeGroupInput')
+    input_node.location = (0, 0)
+
+    cube_node = nodes.new(type='GeometryNodeMeshCube')
+    cube_node.inputs["Size"].default_value = (1, 1, 1)
+    cube_node.location = (0, -200)
+
+    transform_node = nodes.new(type='GeometryNodeTransform')
+    transform_node.inputs["Translation"].default_value = (0, 0, 0.5)
+    transform_node.location = (200, -200)
+
+    material_node = nodes.new(type='GeometryNodeSetMaterial')
+    material_node.inputs["Material"].default_value = material
+    material_node.location = (400, -200)
+
+    scale_node = nodes.new(type='GeometryNodeInputNamedAttribute')
+    scale_node.data_type = 'FLOAT_VECTOR'
+    scale_node.inputs["Name"].default_value = "bar_scale"
+    scale_node.location = (400, -400)
+
+    instance_node = nodes.new(type='GeometryNodeInstanceOnPoints')
+    instance_node.location = (600, 0)
+
+    output_node = nodes.new(type='NodeGroupOutput')
+    output_node.location = (800, 0)
+
+    links.new(input_node.outputs[0], instance_node.inputs["Points"])
+    links.new(cube_node.outputs["Mesh"], transform_node.inputs["Geometry"])
+    links.new(transform_node.outputs["Geometry"], material_node.inputs["Geometry"])
+    links.new(material_node.outputs["Geometry"], instance_node.inputs["Instance"])
+    links.new(scale_node.outputs["Attribute"], instance_node.inputs["Scale"])
+    links.new(instance_node.outputs["Instances"], output_node.inputs[0])
+    return group
+
+
+class Plot3dBars(BasePlot):
+
+    def __init__(self, axes):
+        super().__init__(axes)
+        self.counts = np.zeros((1, 1))
+        self.x_edges = np.array([0.0, 1.0])
+        self.y_edges = np.array([0.0, 1.0])
+        self.bar_width = 0.9
+
+    def of_samples(self, x, y, bins=50, x_range=None, y_range=None, weights=None, chunk_size=1 << 22):
+        '''
+        Plot a 2D histogram of (x, y) samples as 3D bars. The samples are binned chunk_size at a time, so very large (or
+        memory mapped) arrays are never copied in full.
+
+        Args:
+            x: 1D array of x values.
+            y: 1D array of y values, the same length as x.
+            bins: number of bins, either one number for both directions or (x bins, y bins). Defaults to 50.
+            x_range: (start, end) range of the x bins. Defaults to the x range of the axes.
+            y_range: (start, end) range of the y bins. Defaults to the y range of the axes.
+            weights: optional 1D array of weights, so each bar is the sum of the weights of its samples.
+            chunk_size: number of samples binned at a time.
+
+        Returns:
+            self
+        '''
+        if x_range is None:
+            x_range = (self.axes.start[0], self.axes.start[0] + self.axes.extent[0])
+        if y_range is None:
+            y_range = (self.axes.start[1], self.axes.start[1] + self.axes.extent[1])
+        x_bins, y_bins = (bins, bins) if np.ndim(bins) == 0 else bins
+        x_edges = np.linspace(x_range[0], x_range[1], x_bins + 1)
+        y_edges = np.linspace(y_range[0], y_range[1], y_bins + 1)
+
+        counts = np.zeros((x_bins, y_bins))
+        for i0 in range(0, len(x), chunk_size):
+            chunk_weights = None if weights is None else np.asarray(weights[i0:i0 + chunk_size])
+            counts += np.histogram2d(np.asarray(x[i0:i0 + chunk_size]), np.asarray(y[i0:i0 + chunk_size]),
+                                     bins=(x_edges, y_edges), weights=chunk_weights)[0]
+        return self.of_counts(counts, x_edges, y_edges)
+
+    def of_counts(self, counts, x_edges, y_edges):
+        '''
+        Plot precomputed bar heights, for example the result of np.histogram2d.
+
+        Args:
+            counts: (x bins, y bins) array of bar heights. counts[i, j] is the bar between x_edges[i] and x_edges[i+1]
+                and between y_edges[j] and y_edges[j+1].
+            x_edges: x bin edges, one more than the number of x bins.
+            y_edges: y bin edges, one more than the number of y bins.
+
+        Returns:
+            self
+        '''
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        return self
+
+    def with_bar_width(self, bar_width):
+        '''
+        Set the width of each bar as a fraction of its bin. Defaults to 0.9, leaving a small gap between bars.
+
+        Returns:
+            self
+        '''
+        self.bar_width = bar_width
+        return self
+
+    def _bars(self):
+        '''
+        Position and size of every visible bar, in blender coordinates.
+
+        :return: (bases, scales, values, graph) where bases and scales are (n, 3) arrays, values holds the bar heights
+            in graph units and graph is the (n, 3) graph coordinates of the bar tops.
+        '''
+        xb = self.axes._to_blender(0, self.x_edges)
+        yb = self.axes._to_blender(1, self.y_edges)
+        x_centres, y_centres = np.meshgrid((xb[:-1] + xb[1:]) / 2, (yb[:-1] + yb[1:]) / 2, indexing='ij')
+        x_widths, y_widths = np.meshgrid(np.abs(np.diff(xb)), np.abs(np.diff(yb)), indexing='ij')
+
+        # Bars stand on z = 0, or on the bottom of the axes for a log axis, which can't show 0
+        bottom, top = self.axes.axis_start[2], self.axes.axis_end[2]
+        if self.axes.scales[2] == "log":
+            base = bottom
+        else:
+            base = float(np.clip(self.axes._to_blender(2, 0.0), min(bottom, top), max(bottom, top)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tops = np.asarray(self.axes._to_blender(2, self.counts), dtype=np.float64)
+        if self.clip_to_axes:
+            tops = np.minimum(tops, top)
+        # Empty bins are never drawn. Bars whose top is below the base (eg a count below the start of a log axis) are
+        # dropped, a count at the start of a log axis is drawn as a flat bar.
+        visible = (self.counts > 0) & np.isfinite(tops) & (tops >= base)
+        if self.clip_to_axes:
+            visible &= (np.abs(x_centres) <= 1) & (np.abs(y_centres) <= 1)
+
+        bases = np.stack((x_centres[visible], y_centres[visible], np.full(visible.sum(), base)), axis=-1)
+        scales = np.stack((x_widths[visible] * self.bar_width, y_widths[visible] * self.bar_width,
+                           tops[visible] - base), axis=-1)
+        x_mid, y_mid = np.meshgrid((self.x_edges[:-1] + self.x_edges[1:]) / 2, (self.y_edges[:-1] + self.y_edges[1:]) / 2,
+                                   indexing='ij')
+        graph = np.stack((x_mid[visible], y_mid[visible], self.counts[visible]), axis=-1)
+        return bases, scales, self.counts[visible], graph
+
+    def _cost(self):
+        filled = self.colormap is not None
+        return _cost(objects=1, vertices=int(np.count_nonzero(self.counts)), materials=1 if filled else 0)
+
+    def plot(self):
+        '''
+        Create one point per bar, carrying the bar size and value as point attributes, and a geometry nodes modifier that
+        instances a single shared cube on the points. Clipped bars are cut off at the top of the axes, so no boolean
+        operations are needed.
+        '''
+        self._check_plot_budget()
+        bases, scales, values, graph = self._bars()
+        obj = utils.create_mesh_object("bar_plot", bases)
+        mesh = obj.data
+        mesh.attributes.new(name="bar_scale", type='FLOAT_VECTOR', domain='POINT').data.foreach_set(
+            "vector", scales.astype(np.float32).ravel())
+
+        if self.color_scalar is None or self.color_scalar == "z":
+            scalars = values
+        elif self.color_scalar == "gradient":
+            raise ValueError(f"{type(self).__name__} does not support colouring by gradient")
+        else:
+            scalars = _evaluate(self.color_scalar, graph[:, 0], graph[:, 1], graph[:, 2])
+        mesh.attributes.new(name="plot_value", type='FLOAT', domain='POINT').data.foreach_set(
+            "value", scalars.astype(np.float32))
+
+        if self.colormap is not None:
+            value_range = self.color_range
+            if value_range is None:
+                value_range = (float(np.nanmin(scalars)), float(np.nanmax(scalars))) if len(scalars) else (0, 1)
+            self.material = utils.create_colormap_material("Colormap Material", "plot_value",
+                                                           colormaps.color_stops(self.colormap), value_range,
+                                                           attribute_type='INSTANCER')
+        else:
+            self.material = bpy.data.materials.new("col")
+            self.material.diffuse_color = self.line_color
+
+        modifier = obj.modifiers.new("plot_bars", 'NODES')
+        modifier.node_group = _create_bar_node_group(self.material)
+        return obj
@@ -0,0 +1,218 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Render result cache. The final scene state is hashed (every property of the scene and the data it uses, see
+scene_hash). If an image with that hash is already in the cache directory it is copied to the output path and the render
+is skipped.
+'''
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import bpy
+import numpy as np
+
+_stats = {"hits": 0, "misses": 0}
+
+
+def cache_stats():
+    '''
+    Returns:
+        dictionary with the number of cache hits and misses so far in this process
+    '''
+    return dict(_stats)
+
+
+def _update(digest, *values):
+    for value in values:
+        if isinstance(value, np.ndarray):
+            digest.update(value.tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b"|")
+
+
+def _collection(digest, collection, attribute, dtype, width):
+    data = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, data)
+    _update(digest, data)
+
+
+# Bumped whenever the way scenes are hashed changes, so old cache entries are not reused
+CACHE_FORMAT = 2
+
+# Properties that never affect the rendered image, or that refer back into structures already being hashed
+_SKIP_PROPERTIES = {
+    "rna_type", "name_full", "session_uid", "is_evaluated", "original", "users", "use_fake_user", "use_extra_user",
+    "is_embedded_data", "is_runtime_data", "is_missing", "is_library_indirect", "library", "library_weak_reference",
+    "override_library", "preview", "asset_data", "tag", "is_editmode", "depsgraph", "tool_settings", "cursor",
+    "keying_sets", "keying_sets_all", "timeline_markers", "pixels", "bindcode", "select",
+}
+
+# Properties skipped on particular types. The output path and frame number don't change the image, and the bulk
+# geometry collections are hashed with foreach_get instead
+_SKIP_TYPE_PROPERTIES = {
+    "RenderSettings": {"filepath"},
+    "Scene": {"frame_current", "frame_current_final", "frame_float"},
+    "Mesh": {"vertices", "edges", "loops", "polygons", "loop_triangles", "loop_triangle_polygons", "attributes",
+             "color_attributes", "vertex_colors", "uv_layers", "polygon_normals", "vertex_normals", "corner_normals",
+             "vertex_creases", "edge_creases", "normals_domain"},
+    "Spline": {"points", "bezier_points"},
+}
+
+_MAX_DEPTH = 16
+
+# Field, dtype and width used to read each type of mesh attribute in bulk
+_ATTRIBUTE_FIELDS = {
+    'FLOAT': ("value", np.float32, 1),
+    'INT': ("value", np.int32, 1),
+    'INT8': ("value", np.int32, 1),
+    'BOOLEAN': ("value", bool, 1),
+    'FLOAT2': ("vector", np.float32, 2),
+    'INT32_2D': ("value", np.int32, 2),
+    'FLOAT_VECTOR': ("vector", np.float32, 3),
+    'FLOAT_COLOR': ("color", np.float32, 4),
+    'BYTE_COLOR': ("color", np.float32, 4),
+    'QUATERNION': ("value", np.float32, 4),
+    'FLOAT4X4': ("value", np.float32, 16),
+}
+
+
+class _Hasher:
+    '''
+    Hash Blender data generically, by walking the RNA properties of each struct. Every struct is hashed once, later
+    references to it only add its path, so shared data and reference cycles are handled.
+    '''
+
+    def __init__(self, digest):
+        self.digest = digest
+        self.seen = set()
+
+    def struct(self, struct, depth=0):
+        if struct is None:
+            _update(self.digest, None)
+            return
+        key = struct.as_pointer() if hasattr(struct, "as_pointer") else id(struct)
+        type_name = type(struct).__name__
+        if key in self.seen or depth > _MAX_DEPTH:
+            _update(self.digest, "ref", type_name, getattr(struct, "name", None))
+            return
+        self.seen.add(key)
+        _update(self.digest, "struct", type_name)
+
+        if isinstance(struct, bpy.types.Mesh):
+            self._mesh(struct)
+        elif isinstance(struct, bpy.types.Spline):
+            _collection(self.digest, struct.points, "co", np.float32, 4)
+            _collection(self.digest, struct.points, "radius", np.float32, 1)
+            _collection(self.digest, struct.bezier_points, "co", np.float32, 3)
+        elif isinstance(struct, bpy.types.Volume):
+            path = bpy.path.abspath(struct.filepath)
+            if os.path.exists(path):
+                _update(self.digest, os.path.getmtime(path), os.path.getsize(path))
+
+        skip = _SKIP_TYPE_PROPERTIES.get(type_name, ())
+        for prop in struct.bl_rna.properties:
+            identifier = prop.identifier
+            if identifier in _SKIP_PROPERTIES or identifier in skip:
+                continue
+            try:
+                value = getattr(struct, identifier)
+            except (AttributeError, RuntimeError, TypeError):
+                continue
+            _update(self.digest, identifier)
+            if prop.type == 'POINTER':
+                self.struct(value, depth + 1)
+            elif prop.type == 'COLLECTION':
+                _update(self.digest, len(value))
+                for item in value:
+                    self.struct(item, depth + 1)
+            else:
+                self.value(value)
+
+    def value(self, value):
+        if isinstance(value, (str, bool, int, float)) or value is None:
+            _update(self.digest, value)
+        elif isinstance(value, (set, frozenset)):
+            _update(self.digest, tuple(sorted(value)))
+        else:
+            # Arrays, vectors, colours and matrices
+            _update(self.digest, np.asarray(value).ravel().tolist())
+
+    def _mesh(self, mesh):
+        digest = self.digest
+        _collection(digest, mesh.vertices, "co", np.float32, 3)
+        _collection(digest, mesh.edges, "vertices", np.int32, 2)
+        _collection(digest, mesh.loops, "vertex_index", np.int32, 1)
+        _collection(digest, mesh.polygons, "loop_start", np.int32, 1)
+        _collection(digest, mesh.polygons, "use_smooth", bool, 1)
+        _collection(digest, mesh.loops, "normal", np.float32, 3)
+        for attribute in sorted(mesh.attributes, key=lambda a: a.name):
+            _update(digest, attribute.name, attribute.data_type, attribute.domain)
+            if attribute.data_type in _ATTRIBUTE_FIELDS:
+                _collection(digest, attribute.data, *_ATTRIBUTE_FIELDS[attribute.data_type])
+            else:
+                for item in attribute.data:
+                    self.value(item.value)
+
+
+def scene_hash(scene):
+    '''
+    Hash everything in the scene that can affect the rendered image: every property of the scene and of the data it
+    uses (objects, meshes, curves, materials, node trees, lights, camera, world, render and colour management settings),
+    except a short list of properties that can't change the image. The hash is salted with the Blender version and the
+    cache format.
+
+    Args:
+        scene: the scene.
+
+    Returns:
+        Hex digest string
+    '''
+    digest = hashlib.sha256()
+    _update(digest, "genpyblender render cache", CACHE_FORMAT, tuple(bpy.app.version))
+    bpy.context.view_layer.update()
+    _Hasher(digest).struct(scene)
+    return digest.hexdigest()
+
+
+def render_cached(scene, output_path, cache_dir, render):
+    '''
+    Render the scene unless an identical scene has been rendered before.
+
+    Args:
+        scene: the scene.
+        output_path: path the image should be written to.
+        cache_dir: directory holding cached images, created if needed.
+        render: function that renders the scene to output_path.
+
+    Returns:
+        output_path
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, scene_hash(scene) + os.path.splitext(output_path)[1])
+    if os.path.exists(cached):
+        _stats["hits"] += 1
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        shutil.copyfile(cached, output_path)
+        result = "hit"
+    else:
+        _stats["misses"] += 1
+        render()
+        # Copy to a temporary file and rename it, so other workers never see a partly written image
+        handle, temporary = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(handle)
+        try:
+            shutil.copyfile(output_path, temporary)
+            os.replace(temporary, cached)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        result = "miss"
+    print(f"Render cache {result} for {output_path} (hits {_stats['hits']}, misses {_stats['misses']})")
+    return output_path
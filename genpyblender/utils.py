@@ -5,14 +5,249 @@
 # Based in part on https://github.com/yuki-koyama/blender-cli-rendering
 
 import bpy
+import numpy as np
+from genpyblender import camera
+
+# The Cycles device probe is slow, so it is only done once per Blender process
+_devices_probed = False
 
 def clean_objects() -> None:
     for item in bpy.data.objects:
         bpy.data.objects.remove(item)
 
+def reset_scene() -> None:
+    '''
+    Reload the startup file, discarding all objects, meshes, materials and compositor nodes from a previous image.
+    Preferences (including the Cycles devices) and imported Python modules are kept.
+    '''
+    bpy.ops.wm.read_homefile(use_empty=False)
+
 def set_smooth_shading(mesh: bpy.types.Mesh) -> None:
-    for polygon in mesh.polygons:
-        polygon.use_smooth = True
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+
+def create_mesh_object(name: str, vertices, faces=None, edges=None) -> bpy.types.Object:
+    '''
+    Create a mesh object from numpy arrays using bulk foreach_set calls, so no per vertex Python code runs. The new
+    object is linked to the active collection and made the active, selected object.
+
+    Args:
+        name: name of the mesh and object.
+        vertices: (n, 3) array of vertex positions.
+        faces: (m, k) array of vertex indices, every face has k vertices, or a list of such arrays with different k.
+        edges: (m, 2) array of vertex indices, for a mesh made of loose edges rather than faces.
+
+    Returns:
+        The new object
+    '''
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    if edges is not None:
+        edges = np.asarray(edges, dtype=np.int32)
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set("vertices", edges.ravel())
+    if faces is not None:
+        if isinstance(faces, (list, tuple)):
+            _add_faces(mesh, [np.asarray(f, dtype=np.int32) for f in faces])
+        else:
+            _add_faces(mesh, [np.asarray(faces, dtype=np.int32)])
+    mesh.update(calc_edges=edges is None)
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(obj)
+    for selected in bpy.context.selected_objects:
+        selected.select_set(False)
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    return obj
+
+def _add_faces(mesh: bpy.types.Mesh, face_arrays) -> None:
+    face_arrays = [f for f in face_arrays if f.size]
+    if not face_arrays:
+        return
+    sizes = np.concatenate([np.full(len(f), f.shape[1], dtype=np.int32) for f in face_arrays])
+    loop_count = int(sizes.sum())
+    mesh.loops.add(loop_count)
+    mesh.loops.foreach_set("vertex_index", np.concatenate([f.ravel() for f in face_arrays]))
+    mesh.polygons.add(len(sizes))
+    mesh.polygons.foreach_set("loop_start", (np.cumsum(sizes) - sizes).astype(np.int32))
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", sizes)
+
+def grid_faces(rows: int, cols: int, wrap_rows: bool = False, wrap_cols: bool = False):
+    '''
+    Quad faces joining a rows x cols grid of vertices stored row by row. Faces are anticlockwise when the row index
+    increases along y and the column index along x.
+
+    Args:
+        rows: number of rows.
+        cols: number of columns.
+        wrap_rows: if True, the last row is also joined to the first row.
+        wrap_cols: if True, the last column is also joined to the first column.
+
+    Returns:
+        (m, 4) int array of vertex indices
+    '''
+    index = np.arange(rows * cols).reshape(rows, cols)
+    if wrap_cols:
+        index = np.hstack((index, index[:, :1]))
+    if wrap_rows:
+        index = np.vstack((index, index[:1]))
+    return np.stack((index[:-1, :-1], index[:-1, 1:], index[1:, 1:], index[1:, :-1]), axis=-1).reshape(-1, 4)
+
+def set_custom_normals(mesh: bpy.types.Mesh, normals) -> None:
+    '''
+    Set smooth shading and per vertex custom normals on a mesh, using bulk calls.
+
+    Args:
+        mesh: the mesh.
+        normals: (n, 3) array of unit normals, one per vertex. A zero vector leaves the normal Blender calculates.
+    '''
+    set_smooth_shading(mesh)
+    if hasattr(mesh, "use_auto_smooth"):
+        # Custom normals are only used if auto smooth is on prior to Blender 4.1
+        mesh.use_auto_smooth = True
+    mesh.normals_split_custom_set_from_vertices(np.asarray(normals, dtype=np.float32).reshape(-1, 3))
+
+def set_color_ramp(color_ramp, stops) -> None:
+    '''
+    Replace the elements of a colour ramp.
+
+    Args:
+        color_ramp: the color_ramp of a ShaderNodeValToRGB node.
+        stops: list of (position, color) tuples in increasing position order.
+    '''
+    elements = color_ramp.elements
+    while len(elements) > 1:
+        elements.remove(elements[-1])
+    elements[0].position = stops[0][0]
+    elements[0].color = stops[0][1]
+    for position, color in stops[1:]:
+        elements.new(position).color = color
+
+def create_colormap_material(name: str, attribute: str, stops, value_range, attribute_type: str = 'GEOMETRY'):
+    '''
+    Create a material that colours an object from a stored scalar attribute, using an
+    Attribute -> Map Range -> Color Ramp -> Principled BSDF node chain. The colours can be changed later by updating the
+    "plot_map_range" and "plot_color_ramp" nodes, without touching the mesh.
+
+    Args:
+        name: material name.
+        attribute: name of the scalar attribute.
+        stops: colour ramp stops, see colormap.color_stops.
+        value_range: (min, max) attribute values mapped to the ends of the ramp.
+        attribute_type: type of the attribute node, 'GEOMETRY' for mesh attributes or 'INSTANCER' for instance
+            attributes.
+
+    Returns:
+        The material
+    '''
+    mat = bpy.data.materials.new(name=name)
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    for node in nodes:
+        nodes.remove(node)
+
+    attribute_node = nodes.new(type='ShaderNodeAttribute')
+    attribute_node.attribute_type = attribute_type
+    attribute_node.attribute_name = attribute
+    attribute_node.location = (0, 0)
+
+    map_range_node = nodes.new(type='ShaderNodeMapRange')
+    map_range_node.name = "plot_map_range"
+    map_range_node.inputs["From Min"].default_value = value_range[0]
+    map_range_node.inputs["From Max"].default_value = value_range[1]
+    map_range_node.location = (200, 0)
+
+    ramp_node = nodes.new(type='ShaderNodeValToRGB')
+    ramp_node.name = "plot_color_ramp"
+    set_color_ramp(ramp_node.color_ramp, stops)
+    ramp_node.location = (400, 0)
+
+    bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
+    bsdf_node.location = (700, 0)
+
+    output_node = nodes.new(type='ShaderNodeOutputMaterial')
+    output_node.location = (1000, 0)
+
+    links.new(attribute_node.outputs["Fac"], map_range_node.inputs["Value"])
+    links.new(map_range_node.outputs["Result"], ramp_node.inputs["Fac"])
+    links.new(ramp_node.outputs["Color"], bsdf_node.inputs["Base Color"])
+    links.new(bsdf_node.outputs["BSDF"], output_node.inputs["Surface"])
+    return mat
+
+def create_volume_colormap_material(name: str, attribute: str, stops, value_range, density: float = 1.0):
+    '''
+    Create a volume material that colours a scalar field, using an Attribute -> Map Range -> Color Ramp chain feeding an
+    emission shader and an absorption shader. The mapped value (0 to 1) times density sets both the emission strength
+    and the absorption density, so values at or below the start of the range are transparent. The colours can be
+    changed later through the "plot_map_range" and "plot_color_ramp" nodes, and the density through "plot_density".
+
+    Args:
+        name: material name.
+        attribute: name of the volume grid or attribute holding the scalar.
+        stops: colour ramp stops, see colormap.color_stops.
+        value_range: (min, max) values mapped to the ends of the ramp.
+        density: density and emission strength of the top of the range.
+
+    Returns:
+        The material
+    '''
+    mat = bpy.data.materials.new(name=name)
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    for node in nodes:
+        nodes.remove(node)
+
+    attribute_node = nodes.new(type='ShaderNodeAttribute')
+    attribute_node.name = "plot_attribute"
+    attribute_node.attribute_name = attribute
+    attribute_node.location = (0, 0)
+
+    map_range_node = nodes.new(type='ShaderNodeMapRange')
+    map_range_node.name = "plot_map_range"
+    map_range_node.inputs["From Min"].default_value = value_range[0]
+    map_range_node.inputs["From Max"].default_value = value_range[1]
+    map_range_node.location = (200, 0)
+
+    ramp_node = nodes.new(type='ShaderNodeValToRGB')
+    ramp_node.name = "plot_color_ramp"
+    set_color_ramp(ramp_node.color_ramp, stops)
+    ramp_node.location = (400, 0)
+
+    density_node = nodes.new(type='ShaderNodeMath')
+    density_node.name = "plot_density"
+    density_node.operation = 'MULTIPLY'
+    density_node.inputs[1].default_value = density
+    density_node.location = (400, -300)
+
+    emission_node = nodes.new(type='ShaderNodeEmission')
+    emission_node.location = (700, 100)
+
+    absorption_node = nodes.new(type='ShaderNodeVolumeAbsorption')
+    absorption_node.location = (700, -150)
+
+    add_node = nodes.new(type='ShaderNodeAddShader')
+    add_node.location = (900, 0)
+
+    output_node = nodes.new(type='ShaderNodeOutputMaterial')
+    output_node.location = (1100, 0)
+
+    links.new(attribute_node.outputs["Fac"], map_range_node.inputs["Value"])
+    links.new(map_range_node.outputs["Result"], ramp_node.inputs["Fac"])
+    links.new(map_range_node.outputs["Result"], density_node.inputs[0])
+    links.new(ramp_node.outputs["Color"], emission_node.inputs["Color"])
+    links.new(ramp_node.outputs["Color"], absorption_node.inputs["Color"])
+    links.new(density_node.outputs["Value"], emission_node.inputs["Strength"])
+    links.new(density_node.outputs["Value"], absorption_node.inputs["Density"])
+    links.new(emission_node.outputs["Emission"], add_node.inputs[0])
+    links.new(absorption_node.outputs["Volume"], add_node.inputs[1])
+    links.new(add_node.outputs["Shader"], output_node.inputs["Volume"])
+    return mat
 
 def set_white_background():
     bpy.context.scene.render.engine = 'CYCLES'
@@ -81,8 +316,38 @@ def set_cycles_renderer(scene: bpy.types.Scene,
         bpy.context.preferences.addons["cycles"].preferences.compute_device_type = "CUDA"
 
     # Call get_devices() to let Blender detects GPU device (if any)
-    bpy.context.preferences.addons["cycles"].preferences.get_devices()
+    global _devices_probed
+    if not _devices_probed:
+        bpy.context.preferences.addons["cycles"].preferences.get_devices()
+        _devices_probed = True
 
     # Let Blender use all available devices, include GPU and CPU
     for d in bpy.context.preferences.addons["cycles"].preferences.devices:
         d["use"] = 1
+
+def set_border_to_objects(scene: bpy.types.Scene, camera_object: bpy.types.Object, margin: float = 0.02) -> None:
+    '''
+    Restrict rendering to the part of the image covered by the visible objects (axes, labels and plots), plus a margin.
+    The output image is cropped to that region, and no samples are spent on the empty background around it.
+
+    Args:
+        scene: the scene. The output resolution must already be set.
+        camera_object: the camera used to render.
+        margin: margin around the objects, as a fraction of the image size.
+    '''
+    corners = [np.array(obj.matrix_world) @ np.hstack((np.array(obj.bound_box), np.ones((8, 1)))).T
+               for obj in scene.objects if obj.type in ('MESH', 'CURVE', 'FONT', 'VOLUME') and not obj.hide_render]
+    if not corners:
+        return
+    points = np.hstack(corners)[:3].T
+    pixels = camera.project_to_pixels(camera_object, points, scene)
+
+    render = scene.render
+    size = np.array((render.resolution_x, render.resolution_y)) * render.resolution_percentage / 100
+    low = np.clip(pixels.min(axis=0) / size - margin, 0, 1)
+    high = np.clip(pixels.max(axis=0) / size + margin, 0, 1)
+    render.border_min_x, render.border_min_y = low
+    render.border_max_x, render.border_max_y = high
+    render.use_border = True
+    render.use_crop_to_border = True
+
@@ -0,0 +1,160 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Long running render worker. Blender is started once, with the genpyblender modules already imported, and then renders
+any number of jobs:
+
+    blender --background -noaudio --python genpyblender/worker.py -- --socket /tmp/genpyblender.sock
+
+or, to read jobs from standard input and write replies to standard output. In this mode only the replies go to
+standard output, any other output (including Blender's render log) is redirected to standard error:
+
+    blender --background -noaudio --python genpyblender/worker.py -- --stdin
+
+Each job is one line of JSON:
+
+    {"script": "/path/to/plot.py", "outfile": "plot", "width": 500, "height": 500}
+
+An optional "cache_dir" entry renders through the render cache (see render_cache.py). An optional "views" entry, a list
+of camera views as for make_blender_image, renders one numbered image per view from a single scene build.
+
+The script must define a draw function with the same signature as the draw functions passed to make_blender_image
+(the name can be changed with a "function" entry). The script is run with __name__ set to "genpyblender_job", so any
+top level call to make_blender_image should be inside an `if __name__ == "__main__":` block. The scene is reset before
+every job.
+
+Each job gets a one line JSON reply, either {"ok": true, "outputs": [...], "timings": {...}} with timings in seconds,
+or {"ok": false, "error": "...", "traceback": "..."}. The job {"command": "shutdown"} stops the worker.
+'''
+
+import argparse
+import json
+import os
+import runpy
+import socket
+import sys
+import time
+import traceback
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpy
+from genpyblender import make_image, utils, camera, lighting, colormap, plots
+
+DEFAULT_SOCKET = "/tmp/genpyblender.sock"
+
+
+def run_job(job):
+    '''
+    Reset the scene, run the draw function of a job script and render the image.
+
+    Args:
+        job: dictionary with keys script, outfile, and optionally function, width, height, cache_dir and views.
+
+    Returns:
+        Reply dictionary
+    '''
+    timings = {}
+    start = time.perf_counter()
+    mark = start
+
+    def lap(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = now - mark
+        mark = now
+
+    utils.reset_scene()
+    lap("reset")
+    namespace = runpy.run_path(job["script"], run_name="genpyblender_job")
+    draw = namespace[job.get("function", "draw")]
+    lap("load")
+    views = job.get("views")
+    if views is not None:
+        # The scene is built and every view rendered in one call, so draw and render are timed together
+        outputs = make_image.make_blender_image(job["outfile"], draw, job.get("width", 500), job.get("height", 500),
+                                                cache_dir=job.get("cache_dir"), views=views)
+        lap("draw_and_render")
+    else:
+        make_image.make_blender_image(job["outfile"], draw, job.get("width", 500), job.get("height", 500))
+        lap("draw")
+        outputs = [make_image.render_still(job.get("cache_dir"))]
+        lap("render")
+    timings["total"] = mark - start
+    return {"ok": True, "outputs": outputs, "timings": timings}
+
+
+def handle_line(line):
+    '''
+    Run the job in one line of JSON.
+
+    Returns:
+        (reply, stop) where reply is the reply dictionary and stop is True if the worker should shut down
+    '''
+    try:
+        job = json.loads(line)
+        if job.get("command") == "shutdown":
+            return {"ok": True}, True
+        return run_job(job), False
+    except Exception as e:
+        return {"ok": False, "error": str(e), "traceback": traceback.format_exc()}, False
+
+
+def serve_stdin():
+    # Blender's render log, the render cache and job scripts all write to stdout. Keep the original stdout as a private
+    # channel for the replies, and send everything else written to file descriptor 1 to stderr.
+    sys.stdout.flush()
+    replies = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    with replies:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            reply, stop = handle_line(line)
+            replies.write(json.dumps(reply) + "\n")
+            replies.flush()
+            if stop:
+                return
+
+
+def serve_socket(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    print(f"genpyblender worker listening on {path}")
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection, connection.makefile("r") as reader, connection.makefile("w") as writer:
+                for line in reader:
+                    if not line.strip():
+                        continue
+                    reply, stop = handle_line(line)
+                    writer.write(json.dumps(reply) + "\n")
+                    writer.flush()
+                    if stop:
+                        return
+    finally:
+        server.close()
+        os.unlink(path)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="genpyblender render worker")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket to listen on")
+    parser.add_argument("--stdin", action="store_true", help="read jobs from standard input instead of a socket")
+    args = parser.parse_args(argv)
+    if args.stdin:
+        serve_stdin()
+    else:
+        serve_socket(args.socket)
+
+
+if __name__ == "__main__":
+    # Blender passes script arguments after "--"
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
@@ -0,0 +1,49 @@
+# Author:  Martin McBride
+# Created: 2026-10-19
+# Copyright (c) 2026, Martin McBride
+# License: GNU GPL V 3
+
+'''
+Client for the render worker in worker.py. This module does not need Blender, so it can be used from any Python script.
+'''
+
+import json
+import socket
+
+DEFAULT_SOCKET = "/tmp/genpyblender.sock"
+
+
+def submit_jobs(jobs, socket_path=DEFAULT_SOCKET):
+    '''
+    Send jobs to a running worker over one connection, waiting for each reply in turn.
+
+    Args:
+        jobs: iterable of job dictionaries, see worker.py.
+        socket_path: path of the worker socket.
+
+    Returns:
+        List of reply dictionaries, one per job
+    '''
+    replies = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        with connection.makefile("r") as reader, connection.makefile("w") as writer:
+            for job in jobs:
+                writer.write(json.dumps(job) + "\n")
+                writer.flush()
+                replies.append(json.loads(reader.readline()))
+    return replies
+
+
+def submit_job(job, socket_path=DEFAULT_SOCKET):
+    '''
+    Send one job to a running worker and wait for the reply.
+    '''
+    return submit_jobs([job], socket_path)[0]
+
+
+def shutdown(socket_path=DEFAULT_SOCKET):
+    '''
+    Stop a running worker.
+    '''
+    return submit_job({"command": "shutdown"}, socket_path)
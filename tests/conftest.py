@@ -0,0 +1,10 @@
+import importlib
+import sys
+from unittest.mock import MagicMock
+
+# The numpy cores are tested outside Blender, so stand in for the Blender modules when they can't be imported
+for name in ("bpy", "bmesh", "mathutils"):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        sys.modules[name] = MagicMock()
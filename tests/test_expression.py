@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from genpyblender.expression import Expression
+
+
+def test_evaluates_over_arrays():
+    x, y = np.meshgrid(np.linspace(-1, 1, 5), np.linspace(-1, 1, 4))
+    np.testing.assert_allclose(Expression("exp(y)*cos(x)", ("x", "y"))(x, y), np.exp(y) * np.cos(x))
+
+
+def test_hash_ignores_whitespace():
+    assert Expression("exp(y) * cos(x)", ("x", "y")).hash == Expression("exp(y)*cos(x)", ("x", "y")).hash
+    assert Expression("exp(y)*cos(x)", ("x", "y")).hash != Expression("exp(y)*cos(x)", ("y", "x")).hash
+
+
+def test_large_integer_power_overflows_instead_of_hanging():
+    with np.errstate(over="ignore"):
+        result = Expression("x + 9**9**9", ("x", "y"))(np.zeros(3), np.zeros(3))
+    assert np.all(np.isinf(result))
+
+
+def test_huge_integer_literal_is_inf():
+    result = Expression("x + 1" + "0" * 400, ("x", "y"))(np.zeros(3), np.zeros(3))
+    assert np.all(np.isinf(result))
+
+
+@pytest.mark.parametrize("source", ["__import__('os')", "x.real", "foo(x)", "z + 1", "'a'", "[x]", "x if y else 1",
+                                    "sin(x, out=y)", "x +", "sin", "sin + x", "min(x)", "sin(x, y)",
+                                    "atan2(x)"])
+def test_rejects_expressions_outside_whitelist(source):
+    with pytest.raises(ValueError):
+        Expression(source, ("x", "y"))
+
+
+def test_two_argument_functions():
+    x = np.linspace(0.5, 1, 3)
+    np.testing.assert_allclose(Expression("min(x, y) + atan2(y, x)", ("x", "y"))(x, 1 - x),
+                               np.minimum(x, 1 - x) + np.arctan2(1 - x, x))
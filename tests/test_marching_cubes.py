@@ -0,0 +1,59 @@
+from collections import Counter
+
+import numpy as np
+
+from genpyblender.marching_cubes import _CORNERS, _EDGES, _TRI_COUNT, _TRI_TABLE, marching_cubes
+
+
+def _sphere(n=24, radius=0.7):
+    u = np.linspace(-1, 1, n)
+    x, y, z = np.meshgrid(u, u, u, indexing='ij')
+    return x * x + y * y + z * z - radius * radius, u[1] - u[0]
+
+
+def test_triangle_table_uses_exactly_the_crossed_edges():
+    assert _TRI_COUNT[0] == 0 and _TRI_COUNT[255] == 0
+    for case in range(256):
+        inside = [bool(case >> corner & 1) for corner in range(8)]
+        crossed = {e for e, (a, b) in enumerate(_EDGES) if inside[a] != inside[b]}
+        used = set(_TRI_TABLE[case, :_TRI_COUNT[case]].ravel().tolist())
+        assert used == crossed
+    assert len(_CORNERS) == 8 and len(_EDGES) == 12
+
+
+def test_sphere_is_closed():
+    values, _ = _sphere()
+    vertices, faces, normals = marching_cubes(values, chunk_size=5)
+    assert len(faces) > 0
+    edges = Counter(tuple(sorted(edge)) for face in faces for edge in ((face[0], face[1]), (face[1], face[2]),
+                                                                       (face[2], face[0])))
+    assert set(edges.values()) == {2}
+    # Consistent winding means each directed edge is used once
+    directed = Counter((a, b) for face in faces for a, b in zip(face, np.roll(face, -1)))
+    assert set(directed.values()) == {1}
+
+
+def test_sphere_vertices_and_winding():
+    values, step = _sphere()
+    vertices, faces, normals = marching_cubes(values)
+    positions = vertices * step - 1
+    np.testing.assert_allclose(np.linalg.norm(positions, axis=-1), 0.7, atol=0.01)
+    np.testing.assert_allclose(np.linalg.norm(normals, axis=-1), 1)
+    # Normals point outwards (increasing values) and triangles are anticlockwise seen from the normal
+    assert np.all(np.einsum('ij,ij->i', normals, positions) > 0)
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    face_normals = np.cross(b - a, c - a)
+    assert np.all(np.einsum('ij,ij->i', face_normals, normals[faces].sum(axis=1)) > 0)
+
+
+def test_chunk_size_does_not_change_result():
+    values, _ = _sphere(n=13)
+    v1, f1, _ = marching_cubes(values, chunk_size=1)
+    v2, f2, _ = marching_cubes(values, chunk_size=100)
+    np.testing.assert_allclose(v1, v2)
+    np.testing.assert_array_equal(f1, f2)
+
+
+def test_no_surface():
+    vertices, faces, normals = marching_cubes(np.ones((4, 4, 4)))
+    assert vertices.shape == (0, 3) and faces.shape == (0, 3)
@@ -0,0 +1,42 @@
+from collections import Counter
+
+import numpy as np
+
+from genpyblender.marching_squares import marching_squares
+
+
+def _grid(n=30):
+    u = np.linspace(-1, 1, n)
+    x, y = np.meshgrid(u, u, indexing='ij')
+    return x, y, np.stack((x, y, np.zeros_like(x)), axis=-1)
+
+
+def test_circle_contours_are_closed_loops():
+    x, y, positions = _grid()
+    vertices, edges = marching_squares(np.hypot(x, y), positions, [0.3, 0.6])
+    degrees = Counter(edges.ravel().tolist())
+    assert len(degrees) == len(vertices)
+    assert set(degrees.values()) == {2}
+    radii = np.sort(np.unique(np.round(np.linalg.norm(vertices, axis=-1), 1)))
+    np.testing.assert_allclose(radii, [0.3, 0.6])
+
+
+def test_vertices_are_interpolated_on_grid_edges():
+    x, y, positions = _grid(5)
+    vertices, edges = marching_squares(x, positions, [0.25])
+    np.testing.assert_allclose(vertices[:, 0], 0.25)
+    assert len(vertices) == 5 and len(edges) == 4
+
+
+def test_saddle_gives_two_separate_segments():
+    values = np.array([[1.0, 0.0], [0.0, 1.0]])
+    positions = np.array([[(0, 0, 0), (0, 1, 0)], [(1, 0, 0), (1, 1, 0)]], dtype=np.float64)
+    vertices, edges = marching_squares(values, positions, [0.5])
+    assert len(vertices) == 4 and len(edges) == 2
+    assert len(set(edges.ravel().tolist())) == 4
+
+
+def test_no_contour():
+    x, y, positions = _grid(4)
+    vertices, edges = marching_squares(x, positions, [5])
+    assert vertices.shape == (0, 3) and edges.shape == (0, 2)
@@ -0,0 +1,113 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from genpyblender import utils
+from genpyblender.plots import Axes, _BoxClipper, _downsample
+
+
+def test_downsample_mean_averages_blocks():
+    data = np.random.default_rng(1).random((100, 60))
+    values, rows, cols = _downsample(data, 10, "mean")
+    assert values.shape == (10, 10)
+    assert values[0, 0] == pytest.approx(data[:10, :6].mean())
+    assert values[3, 7] == pytest.approx(data[30:40, 42:48].mean())
+    np.testing.assert_allclose(rows, np.arange(10) * 10 + 4.5)
+    np.testing.assert_allclose(cols, np.arange(10) * 6 + 2.5)
+
+
+def test_downsample_stride_picks_samples():
+    data = np.arange(50 * 40, dtype=np.float64).reshape(50, 40)
+    values, rows, cols = _downsample(data, 5, "stride")
+    np.testing.assert_array_equal(values, data[rows.astype(int)][:, cols.astype(int)])
+    assert rows[0] == 0 and rows[-1] == 49 and cols[-1] == 39
+
+
+def test_downsample_keeps_small_data():
+    data = np.random.default_rng(2).random((4, 3))
+    values, rows, cols = _downsample(data, 10, "mean")
+    np.testing.assert_allclose(values, data)
+
+
+def test_downsample_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        _downsample(np.zeros((4, 4)), 2, "median")
+
+
+def test_box_clipper_keeps_surface_inside_box():
+    n = 41
+    u = np.linspace(-1.5, 1.5, n)
+    x, y = np.meshgrid(u, u, indexing='ij')
+    grid = np.stack((x, y, 1.3 * np.sin(3 * x) * np.cos(2 * y)), axis=-1)
+    ids = np.arange(n * n).reshape(n, n)
+    quads = ids.ravel()[utils.grid_faces(n, n)]
+    clipper = _BoxClipper(n * n)
+    faces = clipper.clip_tile(grid, np.broadcast_to([0.0, 0.0, 1.0], grid.shape), ids, quads)
+
+    positions = np.concatenate((grid.reshape(-1, 3), np.array(clipper.positions).reshape(-1, 3)))
+    used = np.unique(np.concatenate([f.ravel() for f in faces]))
+    assert np.abs(positions[used]).max() <= 1 + 1e-9
+    np.testing.assert_allclose(np.linalg.norm(clipper.normals, axis=-1), 1)
+
+    edges = Counter(tuple(sorted((a, b))) for f in faces for face in f for a, b in zip(face, np.roll(face, -1)))
+    assert max(edges.values()) == 2
+    # Open edges only lie on the faces of the box
+    for a, b in (edge for edge, count in edges.items() if count == 1):
+        on_plane = np.isclose(np.abs(positions[[a, b]]), 1)
+        assert np.any(on_plane[0] & on_plane[1])
+
+
+def _clip_tiles(grid, splits):
+    rows, cols = grid.shape[:2]
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    clipper = _BoxClipper(rows * cols)
+    for columns in splits:
+        tile_ids = ids[:, columns]
+        clipper.clip_tile(grid[:, columns], np.zeros_like(grid[:, columns]), tile_ids,
+                          tile_ids.ravel()[utils.grid_faces(*tile_ids.shape)])
+    return clipper
+
+
+def test_box_clipper_shares_vertices_between_tiles():
+    n = 9
+    u = np.linspace(-1, 1, n)
+    x, y = np.meshgrid(u, u, indexing='ij')
+    grid = np.stack((x, y, 2 * x + 0.1), axis=-1)
+    # Tiles that share the middle column make the same clip vertices as the whole grid
+    tiled = _clip_tiles(grid, (slice(0, 5), slice(4, 9)))
+    whole = _clip_tiles(grid, (slice(0, 9),))
+    # Each plane crosses n grid edges and n - 1 cell diagonals
+    assert len(tiled.positions) == len(whole.positions) == 2 * (2 * n - 1)
+
+
+def test_box_clipper_keeps_points_on_the_plane():
+    n = 9
+    u = np.linspace(-1, 1, n)
+    x, y = np.meshgrid(u, u, indexing='ij')
+    # Grid points at x = +-0.5 lie exactly on the z planes
+    clipper = _clip_tiles(np.stack((x, y, 2 * x), axis=-1), (slice(0, 9),))
+    assert clipper.positions == []
+
+
+@pytest.mark.parametrize("scales", [("log", "symlog", "linear"), ("symlog", "log", "symlog")])
+def test_axes_round_trip(scales):
+    axes = Axes().of_start((1, -50, -3)).of_extent((999, 100, 6)).with_scales(scales, (1, 2, 0.5))
+    if scales[1] == "log":
+        axes.of_start((-5, 0.1, -3))
+    start = np.array(axes.start, dtype=np.float64)
+    end = start + axes.extent
+    values = [np.linspace(s, e, 7) for s, e in zip(start, end)]
+    blender = axes.convert_points_graph_to_blender(*values)
+    for axis in range(3):
+        assert blender[axis][0] == pytest.approx(-1)
+        assert blender[axis][-1] == pytest.approx(1)
+        assert np.all(np.diff(blender[axis]) > 0)
+    for original, back in zip(values, axes.convert_points_blender_to_graph(*blender)):
+        np.testing.assert_allclose(back, original, rtol=1e-9, atol=1e-9)
+
+
+def test_axes_linear_scalar_matches_array():
+    axes = Axes().of_start((2, 0, -1)).of_extent((4, 1, 2))
+    assert axes.convert_points_graph_to_blender(3.0, 0.5, 0.0) == pytest.approx((-0.5, 0, 0))
+    assert axes._to_graph(0, -0.5) == pytest.approx(3.0)